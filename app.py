@@ -24,6 +24,7 @@ from core.settings import Settings
 from core.info import Info
 from core.gpt import Gpt
 from core.image import Image
+from core.session import close_session
 from core.utils import get_init_value
 
 
@@ -87,10 +88,18 @@ class MainWindow(QMainWindow):
         :param event: close event
         """
         print("Closing...")
+        print("Cancelling requests...")
+        self.controller.input.close()
         print("Saving config...")
         self.config.save_config()
         print("Saving presets...")
         self.config.save_presets()
+        print("Closing context storage...")
+        self.gpt.context.close()
+        print("Flushing files...")
+        self.config.writer.flush()
+        print("Closing connections...")
+        close_session()
         print("Exiting...")
         event.accept()  # let the window close
 
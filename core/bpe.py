@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+import base64
+import marshal
+import mmap
+import os
+
+import tiktoken
+
+ENDOFTEXT = "<|endoftext|>"
+FIM_PREFIX = "<|fim_prefix|>"
+FIM_MIDDLE = "<|fim_middle|>"
+FIM_SUFFIX = "<|fim_suffix|>"
+ENDOFPROMPT = "<|endofprompt|>"
+
+R50K_PAT_STR = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+CL100K_PAT_STR = r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"""
+
+# encodings available offline, ranks are loaded from {name}.tiktoken files
+ENCODINGS = {
+    'r50k_base': {
+        'file': 'r50k_base',
+        'explicit_n_vocab': 50257,
+        'pat_str': R50K_PAT_STR,
+        'special_tokens': {ENDOFTEXT: 50256},
+    },
+    'p50k_base': {
+        'file': 'p50k_base',
+        'explicit_n_vocab': 50281,
+        'pat_str': R50K_PAT_STR,
+        'special_tokens': {ENDOFTEXT: 50256},
+    },
+    'p50k_edit': {
+        'file': 'p50k_base',
+        'explicit_n_vocab': None,
+        'pat_str': R50K_PAT_STR,
+        'special_tokens': {ENDOFTEXT: 50256, FIM_PREFIX: 50281, FIM_MIDDLE: 50282, FIM_SUFFIX: 50283},
+    },
+    'cl100k_base': {
+        'file': 'cl100k_base',
+        'explicit_n_vocab': None,
+        'pat_str': CL100K_PAT_STR,
+        'special_tokens': {
+            ENDOFTEXT: 100257,
+            FIM_PREFIX: 100258,
+            FIM_MIDDLE: 100259,
+            FIM_SUFFIX: 100260,
+            ENDOFPROMPT: 100276,
+        },
+    },
+}
+EXT = '.tiktoken'
+EXT_CACHE = '.bin'
+
+# ranks parsed once per process: file name -> ranks dict
+ranks_cache = {}
+
+
+def parse_ranks(path):
+    """
+    Parses BPE ranks file (base64 token and rank in every line), file is memory-mapped
+
+    :param path: path to .tiktoken file
+    :return: ranks dict: token bytes -> rank
+    """
+    ranks = {}
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = 0
+            size = len(data)
+            while pos < size:
+                end = data.find(b'\n', pos)
+                if end == -1:
+                    end = size
+                line = data[pos:end]
+                pos = end + 1
+                if not line.strip():
+                    continue
+                token, rank = line.split()
+                ranks[base64.b64decode(token)] = int(rank)
+    return ranks
+
+
+def load_ranks(path):
+    """
+    Loads BPE ranks, uses compact binary cache stored next to the ranks file
+
+    :param path: path to .tiktoken file
+    :return: ranks dict or None if file not exists
+    """
+    if path in ranks_cache:
+        return ranks_cache[path]
+    if not os.path.exists(path):
+        return None
+
+    ranks = None
+    cache_path = path + EXT_CACHE
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        try:
+            with open(cache_path, 'rb') as f:
+                ranks = marshal.load(f)
+        except Exception as e:
+            print("Error loading BPE cache: " + str(e))
+            ranks = None
+
+    if ranks is None:
+        ranks = parse_ranks(path)
+        try:
+            with open(cache_path, 'wb') as f:
+                marshal.dump(ranks, f)
+        except Exception as e:
+            print("Error saving BPE cache: " + str(e))
+
+    ranks_cache[path] = ranks
+    return ranks
+
+
+def get_encoding(name, path):
+    """
+    Returns encoding built from local BPE ranks file
+
+    :param name: encoding name
+    :param path: directory with .tiktoken files
+    :return: tiktoken encoding or None if not available offline
+    """
+    if name not in ENCODINGS or path is None:
+        return None
+    params = ENCODINGS[name]
+    try:
+        ranks = load_ranks(os.path.join(path, params['file'] + EXT))
+        if ranks is None:
+            return None
+        return tiktoken.Encoding(
+            name=name,
+            pat_str=params['pat_str'],
+            mergeable_ranks=ranks,
+            special_tokens=params['special_tokens'],
+            explicit_n_vocab=params['explicit_n_vocab'],
+        )
+    except Exception as e:
+        print("Error loading BPE file: " + str(e))
+        return None
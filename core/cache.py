@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+from collections import OrderedDict
+
+ITEM_OVERHEAD = 200  # approx. bytes used by context item object besides texts
+
+
+class ContextCache:
+    def __init__(self):
+        """
+        LRU cache of parsed contexts
+
+        Every entry keeps storage version of context (e.g. file mtime) from the time it was cached,
+        entry with other version is dropped on access
+        """
+        self.entries = OrderedDict()  # name -> (items, has_more, version, count, size), oldest first
+        self.items = 0
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, name, version):
+        """
+        Returns cached context
+
+        :param name: context name (id)
+        :param version: current storage version of context
+        :return: (items, has_more) or None if not cached or changed
+        """
+        if name not in self.entries:
+            self.misses += 1
+            return None
+        items, has_more, cached_version, count, size = self.entries[name]
+        if version is None or cached_version != version:
+            self.remove(name)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(name)
+        self.hits += 1
+        return items, has_more
+
+    def contains(self, name):
+        """
+        Checks if context is cached (without checking version)
+
+        :param name: context name (id)
+        :return: True if cached
+        """
+        return name in self.entries
+
+    def put(self, name, items, has_more, version, max_items, max_size):
+        """
+        Caches context (evicts least recently used contexts if limits exceeded)
+
+        :param name: context name (id)
+        :param items: context items
+        :param has_more: context has older items not loaded yet
+        :param version: storage version of context
+        :param max_items: max number of items in cache
+        :param max_size: max approx. size of items in cache (bytes)
+        """
+        self.remove(name)
+        count = len(items)
+        size = self.get_size(items)
+        if version is None or count > max_items or size > max_size:
+            return
+        self.entries[name] = (items, has_more, version, count, size)
+        self.items += count
+        self.size += size
+        while self.items > max_items or self.size > max_size:
+            self.remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def get_size(self, items):
+        """
+        Returns approx. size of items in memory
+
+        :param items: context items
+        :return: size in bytes
+        """
+        size = 0
+        for item in items:
+            size += ITEM_OVERHEAD
+            if item.input is not None:
+                size += len(item.input)
+            if item.output is not None:
+                size += len(item.output)
+        return size
+
+    def remove(self, name):
+        """
+        Removes context from cache
+
+        :param name: context name (id)
+        """
+        if name in self.entries:
+            items, has_more, version, count, size = self.entries.pop(name)
+            self.items -= count
+            self.size -= size
+
+    def clear(self):
+        """Removes all contexts from cache"""
+        self.entries.clear()
+        self.items = 0
+        self.size = 0
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+import json
+
+from core.compress import open_file
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+CODEC_AUTO = 'auto'
+CODEC_ORJSON = 'orjson'
+CODEC_UJSON = 'ujson'
+CODEC_JSON = 'json'
+PRETTY_INDENT = 4  # indent of user-editable files (config, presets)
+
+codec = CODEC_JSON  # codec used for data files, selected by set_codec
+
+
+def get_codecs():
+    """
+    Returns available codecs (fastest first)
+
+    :return: codecs names list
+    """
+    codecs = []
+    if orjson is not None:
+        codecs.append(CODEC_ORJSON)
+    if ujson is not None:
+        codecs.append(CODEC_UJSON)
+    codecs.append(CODEC_JSON)
+    return codecs
+
+
+def set_codec(name=CODEC_AUTO):
+    """
+    Selects codec (fastest available if auto or not installed)
+
+    :param name: codec name (auto, orjson, ujson or json)
+    :return: selected codec name
+    """
+    global codec
+    codecs = get_codecs()
+    codec = name if name in codecs else codecs[0]
+    return codec
+
+
+def get_codec():
+    """
+    Returns selected codec
+
+    :return: codec name
+    """
+    return codec
+
+
+def loads(data):
+    """
+    Parses JSON
+
+    :param data: JSON string or bytes
+    :return: parsed data
+    """
+    if codec == CODEC_ORJSON:
+        return orjson.loads(data)
+    elif codec == CODEC_UJSON:
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+def dumpb(obj, pretty=False):
+    """
+    Serializes to JSON bytes (UTF-8)
+
+    Data files are written compact, pretty mode (indented, stdlib) is for files edited by user
+
+    :param obj: data
+    :param pretty: indent output
+    :return: JSON bytes
+    """
+    if codec == CODEC_ORJSON and not pretty:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # not supported by orjson (e.g. non-string keys or big integers)
+    return dumps(obj, pretty).encode("utf-8")
+
+
+def dumps(obj, pretty=False):
+    """
+    Serializes to JSON string
+
+    :param obj: data
+    :param pretty: indent output
+    :return: JSON string
+    """
+    if pretty:
+        return json.dumps(obj, indent=PRETTY_INDENT)
+    if codec == CODEC_ORJSON:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            pass
+    elif codec == CODEC_UJSON:
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def load(path):
+    """
+    Reads and parses JSON file (compressed files are decompressed while reading)
+
+    Whole (decompressed) file is held in memory while parsing (no codec parses incrementally,
+    json.load reads all data too), large contexts should use partial storage (jsonl or sqlite)
+
+    :param path: file path
+    :return: parsed data
+    """
+    with open_file(path) as f:
+        return loads(f.read())
+
+
+set_codec()
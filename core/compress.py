@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+import gzip
+import io
+import shutil
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+METHOD_NONE = 'none'
+METHOD_AUTO = 'auto'
+METHOD_GZIP = 'gzip'
+METHOD_ZSTD = 'zstd'
+MAGIC = {
+    METHOD_GZIP: b'\x1f\x8b',
+    METHOD_ZSTD: b'\x28\xb5\x2f\xfd',
+}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+CHUNK_SIZE = 1024 * 1024
+
+
+def get_method(name):
+    """
+    Returns compression method available for config value
+
+    :param name: method name (none, auto, gzip or zstd)
+    :return: method name or None if compression is disabled
+    """
+    if name is None or name == METHOD_NONE or name is False:
+        return None
+    if name in [METHOD_AUTO, METHOD_ZSTD] and zstandard is not None:
+        return METHOD_ZSTD
+    return METHOD_GZIP
+
+
+def detect(path):
+    """
+    Detects file compression by magic bytes
+
+    :param path: file path
+    :return: method name or None if file is not compressed
+    """
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for method in MAGIC:
+        if head.startswith(MAGIC[method]):
+            return method
+    return None
+
+
+def open_file(path):
+    """
+    Opens file for binary reading, compressed files are decompressed while reading (stream)
+
+    :param path: file path
+    :return: readable binary file object (iterable by lines)
+    """
+    method = detect(path)
+    if method == METHOD_GZIP:
+        return gzip.open(path, 'rb')
+    elif method == METHOD_ZSTD:
+        if zstandard is None:
+            raise Exception("File {} is compressed with zstd, install zstandard package to read it".format(path))
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+        return io.BufferedReader(reader, CHUNK_SIZE)
+    return open(path, 'rb')
+
+
+def compress_stream(src, dst, method):
+    """
+    Compresses stream into file object
+
+    :param src: readable binary file object
+    :param dst: writable binary file object
+    :param method: compression method (gzip or zstd)
+    """
+    if method == METHOD_ZSTD:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        with compressor.stream_writer(dst, closefd=False) as writer:
+            shutil.copyfileobj(src, writer, CHUNK_SIZE)
+    else:
+        with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=GZIP_LEVEL) as writer:
+            shutil.copyfileobj(src, writer, CHUNK_SIZE)
@@ -14,7 +14,9 @@ import os
 import re
 from pathlib import Path
 import shutil
-import json
+
+from core.codec import dumps, load, set_codec
+from core.writer import Writer, set_policy, recover
 
 
 class Config:
@@ -32,6 +34,7 @@ class Config:
         self.data = {}
         self.presets = {}
         self.version = self.get_version()
+        self.writer = Writer()  # write-behind writer, shared by all app files
 
     def get_available_langs(self):
         """
@@ -96,9 +99,7 @@ class Config:
 
         filepath = os.path.join(self.path, 'presets', preset + '.json')
         try:
-            f = open(filepath, "w", encoding="utf-8")
-            json.dump(self.presets[preset], f, indent=4)
-            f.close()
+            self.writer.write(filepath, dumps(self.presets[preset], True))
         except Exception as e:
             print(e)
 
@@ -109,22 +110,35 @@ class Config:
             print("FATAL ERROR: {} not found!".format(path))
             return None
         try:
-            f = open(path, "r", encoding="utf-8")
-            self.models = json.load(f)
-            f.close()
+            self.models = load(path)
         except Exception as e:
             print(e)
 
     def load_config(self):
         """Loads app config from JSON file"""
         path = os.path.join(self.path, 'config.json')
+        self.writer.flush(path)
         if not os.path.exists(path):
             print("FATAL ERROR: {} not found!".format(path))
             return None
         try:
-            f = open(path, "r", encoding="utf-8")
-            self.data = json.load(f)
-            f.close()
+            self.data = load(path)
+            self.append_missing_options()
+            set_policy(self.data['write_fsync'], self.data['write_journal'])
+            set_codec(self.data['json_codec'])
+        except Exception as e:
+            print(e)
+
+    def append_missing_options(self):
+        """Appends options missing in user config (added in newer versions) from base config"""
+        path = os.path.join('.', 'data', 'config', 'config.json')
+        if not os.path.exists(path):
+            return
+        try:
+            base = load(path)
+            for key in base:
+                if key not in self.data:
+                    self.data[key] = base[key]
         except Exception as e:
             print(e)
 
@@ -134,6 +148,7 @@ class Config:
 
     def load_presets(self):
         """Loads presets templates from JSON files"""
+        self.writer.flush()  # pending presets writes
         path = os.path.join(self.path, 'presets')
         if not os.path.exists(path):
             print("FATAL ERROR: {} not found!".format(path))
@@ -141,9 +156,7 @@ class Config:
         try:
             for filename in os.listdir(path):
                 if filename.endswith(".json"):
-                    f = open(os.path.join(path, filename), "r", encoding="utf-8")
-                    self.presets[filename[:-5]] = json.load(f)
-                    f.close()
+                    self.presets[filename[:-5]] = load(os.path.join(path, filename))
             self.sort_presets_by_name()
             self.append_current_presets()
         except Exception as e:
@@ -311,6 +324,7 @@ class Config:
 
         if remove_file:
             path = os.path.join(self.path, 'presets', name + '.json')
+            self.writer.discard(path)  # pending write would recreate file
             if os.path.exists(path):
                 os.remove(path)
             self.load_presets()
@@ -379,30 +393,24 @@ class Config:
     def save(self):
         """Saves config into file"""
         self.data['__meta__'] = self.append_meta()
-        dump = json.dumps(self.data, indent=4)
+        dump = dumps(self.data, True)
         path = os.path.join(self.path, 'config.json')
-        with open(path, 'w', encoding="utf-8") as f:
-            f.write(dump)
-            f.close()
+        self.writer.write(path, dump)
 
     def save_config(self):
         """Saves config into file"""
         self.data['__meta__'] = self.append_meta()
-        dump = json.dumps(self.data, indent=4)
+        dump = dumps(self.data, True)
         path = os.path.join(self.path, 'config.json')
-        with open(path, 'w', encoding="utf-8") as f:
-            f.write(dump)
-            f.close()
+        self.writer.write(path, dump)
 
     def save_presets(self):
         """Saves presets into files"""
         for key in self.presets:
             self.presets[key]['__meta__'] = self.append_meta()
             path = os.path.join(self.path, 'presets', key + '.json')
-            dump = json.dumps(self.presets[key], indent=4)
-            with open(path, 'w', encoding="utf-8") as f:
-                f.write(dump)
-                f.close()
+            dump = dumps(self.presets[key], True)
+            self.writer.write(path, dump)
 
     def get_model_tokens(self, model):
         """
@@ -415,6 +423,14 @@ class Config:
             return self.models[model]['tokens']
         return 1
 
+    def get_timeout(self):
+        """
+        Returns API request timeout
+
+        :return: (connect timeout, read timeout) in seconds
+        """
+        return self.data['api_timeout_connect'], self.data['api_timeout_read']
+
     def append_meta(self):
         """
         Appends meta data
@@ -434,6 +450,10 @@ class Config:
             path = Path(self.path)
             path.mkdir(parents=True, exist_ok=True)
 
+            # repair files broken by interrupted writes
+            recover(self.path)
+            recover(os.path.join(self.path, 'presets'))
+
             # install config file
             dst = os.path.join(self.path, 'config.json')
             if not os.path.exists(dst):
@@ -467,5 +487,16 @@ class Config:
             if not os.path.exists(img_dir):
                 os.mkdir(img_dir)
 
+            # install tiktoken BPE files (for offline usage)
+            bpe_dir = os.path.join(self.path, 'tiktoken')
+            if not os.path.exists(bpe_dir):
+                os.mkdir(bpe_dir)
+            src_dir = os.path.join('.', 'data', 'tiktoken')
+            if os.path.exists(src_dir):
+                for file in os.listdir(src_dir):
+                    dst = os.path.join(bpe_dir, file)
+                    if file.endswith('.tiktoken') and not os.path.exists(dst):
+                        shutil.copyfile(os.path.join(src_dir, file), dst)
+
         except Exception as e:
             print(e)
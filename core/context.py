@@ -9,12 +9,20 @@
 # Created Date: 2023.04.09 20:00:00                  #
 # ================================================== #
 
+import bisect
 import datetime
-import json
 import os
+import threading
 import time
 
-from core.tokens import num_tokens_from_context_item
+from core.cache import ContextCache
+from core.compress import get_method
+from core.deque import ContextDeque
+from core.frame import ConversationFrame
+from core.storage.json_file import JsonStorage
+from core.storage.jsonl import JsonlStorage
+from core.storage.sqlite import SqliteStorage
+from core.tokens import num_tokens_from_context_item, num_tokens_from_context_items, calibrate_estimate
 from core.utils import trans
 
 
@@ -27,34 +35,233 @@ class Context:
         """
         self.config = config
         self.contexts = {}
-        self.items = []
+        self.items = ContextDeque()
         self.current_ctx = None
+        self.items_ctx = None  # context name (id) of loaded items
+        self.cache = ContextCache()
+        self.tokens_index = ContextDeque([0])  # prefix sums of items tokens, extended lazily
+        self.tokens_index_model = None
+        self.storage = None
+        self.has_more = False  # older items of current context are not loaded yet (lazy loading)
+        self.compressor = None
+        self.version = 0  # changed on every items change
+        self.prompt_counts = None  # last counted prompt items: (key, (items count, tokens count))
+
+    def get_storage(self, id):
+        """
+        Returns storage by id
+
+        :param id: storage id (json, jsonl or sqlite)
+        :return: storage object
+        """
+        if id == 'sqlite':
+            return SqliteStorage(self.config)
+        elif id == 'jsonl':
+            return JsonlStorage(self.config)
+        return JsonStorage(self.config)
+
+    def init_storage(self):
+        """Initializes storage selected in config, migrates contexts from JSON files into newly created storage"""
+        if self.storage is not None:
+            return
+        id = self.config.data['ctx_storage']
+        storage = self.get_storage(id)
+        try:
+            created = storage.install()
+            if created and id != 'json':
+                self.migrate(self.get_storage('json'), storage)
+        except Exception as e:
+            print("Error initializing {} storage: {}".format(id, e))
+            storage = self.get_storage('json')
+            storage.install()
+        self.storage = storage
+
+    def migrate(self, src, dst):
+        """
+        Copies all contexts from one storage to another
+
+        :param src: source storage
+        :param dst: destination storage
+        :return: number of migrated contexts
+        """
+        src.install()
+        contexts = src.load_list()
+        for name in contexts:
+            try:
+                dst.save(name, ConversationFrame.from_data(src.load(name)))
+                dst.save_meta(name, contexts[name])
+            except Exception as e:
+                print("Error migrating context {}: {}".format(name, e))
+        if len(contexts) > 0:
+            print("Migrated {} contexts".format(len(contexts)))
+        return len(contexts)
+
+    def close(self):
+        """Closes storage"""
+        if self.storage is not None:
+            try:
+                self.storage.close()
+            except Exception as e:
+                print(e)
+
+    def is_lazy(self):
+        """
+        Checks if contexts should be loaded lazily (newest items first)
+
+        :return: True if lazy loading is enabled and supported by storage
+        """
+        self.init_storage()
+        return self.config.data['ctx_lazy'] and self.storage.PARTIAL
+
+    def is_store(self):
+        """
+        Checks if contexts should be stored
+
+        :return: True if history storing is enabled
+        """
+        return self.config.data['store_history']
 
     def load_list(self):
-        """Loads contexts list from file"""
-        path = os.path.join(self.config.path, 'context.json')
+        """Loads contexts list from storage"""
+        self.init_storage()
         try:
-            if os.path.exists(path):
-                with open(path, "r", encoding="utf-8") as file:
-                    self.contexts = json.load(file)['items']
+            self.storage.recover()
         except Exception as e:
             print(e)
-            self.contexts = {}
+        self.contexts = self.storage.load_list()
+
+    def start_compressor(self):
+        """Starts compressing old contexts on background thread (if enabled), call after current context is set"""
+        method = get_method(self.config.data['ctx_compress'])
+        if method is None or self.compressor is not None:
+            return
+        self.compressor = threading.Thread(target=self.compress_old, args=(method, self.config.data['ctx_compress_days']),
+                                           daemon=True)
+        self.compressor.start()
+
+    def compress_old(self, method, days):
+        """
+        Compresses contexts not modified for given number of days (current context is skipped)
+
+        :param method: compression method
+        :param days: min number of days since last modification
+        """
+        num = 0
+        for name in list(self.contexts.keys()):
+            if name == self.items_ctx or name == self.current_ctx:
+                continue
+            try:
+                if self.storage.compress(name, method, days):
+                    num += 1
+            except Exception as e:
+                print("Error compressing context {}: {}".format(name, e))
+        if num > 0:
+            print("Compressed {} contexts ({})".format(num, method))
 
     def load(self, name):
         """
-        Loads context from file
+        Loads context from storage
 
         :param name: context name (id)
         :return: context items
         """
-        path = os.path.join(self.config.path, 'context', name + '.json')
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as file:
-                return self.parse(json.load(file))
-        else:
+        self.init_storage()
+        try:
+            return self.parse(self.storage.load(name))
+        except Exception as e:
+            print(e)
             return []
 
+    def load_frame(self, name):
+        """
+        Loads context from storage into columnar frame (for bulk operations on many contexts)
+
+        :param name: context name (id)
+        :return: conversation frame
+        """
+        self.init_storage()
+        try:
+            return ConversationFrame.from_data(self.storage.load(name))
+        except Exception as e:
+            print(e)
+            return ConversationFrame()
+
+    def load_tail(self, name, limit, before=None):
+        """
+        Loads last context items from storage
+
+        :param name: context name (id)
+        :param limit: max number of items
+        :param before: load only items older than item with this id (None = newest)
+        :return: context items
+        """
+        self.init_storage()
+        try:
+            return self.parse(self.storage.load_tail(name, limit, before))
+        except Exception as e:
+            print(e)
+            return []
+
+    def get_cached(self, name):
+        """
+        Returns context from cache if not changed in storage
+
+        :param name: context name (id)
+        :return: (items, has_more) or None
+        """
+        self.init_storage()
+        try:
+            return self.cache.get(name, self.storage.get_version(name))
+        except Exception as e:
+            print(e)
+            return None
+
+    def prefetch(self, name):
+        """
+        Loads context to be cached (may be called on worker thread)
+
+        :param name: context name (id)
+        :return: (items, has_more, version) or None if not needed
+        """
+        if name not in self.contexts or name == self.items_ctx or not self.is_store() or self.cache.contains(name):
+            return None
+        self.init_storage()
+        try:
+            version = self.storage.get_version(name)  # before load, so changes made meanwhile invalidate entry
+        except Exception as e:
+            print(e)
+            return None
+        items, has_more = self.load_items(name)
+        return items, has_more, version
+
+    def cache_prefetched(self, name, items, has_more, version):
+        """
+        Caches prefetched context
+
+        :param name: context name (id)
+        :param items: context items
+        :param has_more: context has older items not loaded yet
+        :param version: storage version of context
+        """
+        if name not in self.contexts or name == self.items_ctx or self.cache.contains(name):
+            return
+        self.cache.put(name, items, has_more, version,
+                       self.config.data['ctx_cache_items'],
+                       self.config.data['ctx_cache_size'] * 1024 * 1024)
+
+    def cache_items(self):
+        """Caches loaded items of current context (before switching to other context)"""
+        name = self.items_ctx
+        if name is None or name not in self.contexts or not self.is_store():
+            return
+        self.init_storage()
+        try:
+            self.cache.put(name, self.items, self.has_more, self.storage.get_version(name),
+                           self.config.data['ctx_cache_items'],
+                           self.config.data['ctx_cache_size'] * 1024 * 1024)
+        except Exception as e:
+            print(e)
+
     def parse(self, data):
         """
         Parses context data
@@ -66,6 +273,8 @@ class Context:
         for item in data:
             ctx = ContextItem()
             ctx.deserialize(item)
+            if ctx.id is None:
+                ctx.id = len(items) + 1  # items stored before ids were introduced
             items.append(ctx)
         return items
 
@@ -86,50 +295,47 @@ class Context:
         :return: created context name (id)
         """
         name = self.create_id()  # create unique id
+        self.cache_items()
         self.contexts[name] = {
             'id': name,
             "name": "{}".format(trans('ctx.new.prefix')),
             "date": datetime.datetime.now().strftime("%Y-%m-%d")
         }
         self.current_ctx = name
-        self.items = []
-        self.dump_context(name)
+        self.items = ContextDeque()
+        self.items_ctx = name
+        self.has_more = False
+        self.reset_tokens_index()
+        self.changed()
+        self.dump_meta(name)
 
         return name
 
-    def dump_context(self, name):
+    def dump_meta(self, name):
         """
-        Dumps context to file
+        Dumps context index entry to storage
 
         :param name: context name (id)
         """
-        if not self.config.data['store_history']:
+        if not self.is_store() or name not in self.contexts:
             return
-
+        self.init_storage()
         try:
-            # update current context items
-            items_path = os.path.join(self.config.path, 'context', name + '.json')
-            items = []
-            for item in self.items:
-                items.append(item.serialize())
-            dump = json.dumps(items, indent=4)
-            with open(items_path, 'w', encoding="utf-8") as f:
-                f.write(dump)
-                f.close()
-
-            # update contexts index
-            index_path = os.path.join(self.config.path, 'context.json')
-            data = {}
-            data['items'] = self.contexts.copy()
-            data['__meta__'] = self.config.append_meta()
-            dump = json.dumps(data, indent=4)
-            with open(index_path, 'w', encoding="utf-8") as f:
-                f.write(dump)
-                f.close()
-
+            self.storage.save_meta(name, self.contexts[name])
         except Exception as e:
             print(e)
 
+    def rename(self, name, title):
+        """
+        Renames context
+
+        :param name: context name (id)
+        :param title: new context title
+        """
+        if name in self.contexts:
+            self.contexts[name]['name'] = title
+            self.dump_meta(name)
+
     def get_list(self):
         """
         Gets context items sorted descending by date
@@ -176,14 +382,14 @@ class Context:
 
         :param name: context name (id)
         """
+        self.cache.remove(name)
         if name in self.contexts:
             del self.contexts[name]
-            path = os.path.join(self.config.path, 'context', name + '.json')
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                except Exception as e:
-                    print(e)
+            self.init_storage()
+            try:
+                self.storage.delete(name)
+            except Exception as e:
+                print(e)
 
     def prepare(self):
         """Prepares context for prompt"""
@@ -193,28 +399,14 @@ class Context:
 
     def delete_all_ctx(self):
         """Deletes all contexts"""
-        # delete all context files
-        for name in self.contexts:
-            path = os.path.join(self.config.path, 'context', name + '.json')
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                except Exception as e:
-                    print(e)
-        self.contexts = {}
-
-        # update contexts index
-        index_path = os.path.join(self.config.path, 'context.json')
-        data = {}
-        data['items'] = {}
-        data['__meta__'] = self.config.append_meta()
+        # delete all contexts from storage
+        self.cache.clear()
+        self.init_storage()
         try:
-            dump = json.dumps(data, indent=4)
-            with open(index_path, 'w', encoding="utf-8") as f:
-                f.write(dump)
-                f.close()
+            self.storage.delete_all()
         except Exception as e:
             print(e)
+        self.contexts = {}
 
         # delete all txt history files from history dir
         path = os.path.join(self.config.path, 'history')
@@ -225,54 +417,116 @@ class Context:
                 except Exception as e:
                     print(e)
 
-    def count_prompt_items(self, model, used_tokens=100, max_tokens=1000):
+    def reset_tokens_index(self):
+        """Resets tokens prefix-sum index"""
+        self.tokens_index = ContextDeque([0])
+        self.tokens_index_model = None
+
+    def truncate_tokens_index(self, idx):
         """
-        Counts context items to add to prompt
+        Invalidates tokens index from item index
+
+        :param idx: index of first changed item
+        """
+        if idx < 0:
+            idx = 0
+        self.tokens_index.truncate(idx + 1)
+
+    def get_tokens_index(self, model):
+        """
+        Returns tokens prefix-sum index for model
+
+        tokens_index[i] - tokens_index[j] is the number of tokens used by items[j:i]
+
+        :param model: model
+        :return: prefix sums list (len = items count + 1)
+        """
+        if model != self.tokens_index_model or len(self.tokens_index) > len(self.items) + 1:
+            self.tokens_index = ContextDeque([0])
+            self.tokens_index_model = model
+
+        # append missing (new or invalidated) items
+        for i in range(len(self.tokens_index) - 1, len(self.items)):
+            self.tokens_index.append(self.tokens_index[-1] + num_tokens_from_context_item(self.items[i], model))
+        return self.tokens_index
+
+    def get_prompt_plan(self, model, used_tokens=100, max_tokens=1000):
+        """
+        Plans context items to add to prompt (newest items first, until max tokens)
 
         :param model: model
         :param used_tokens: used tokens
         :param max_tokens: max tokens
-        :return: context items count, context tokens count
+        :return: context items list, context tokens count
         """
-        i = 0
-        # loop on items from end to start
-        tokens = used_tokens
-        context_tokens = 0
-        for item in reversed(self.items):
-            num = num_tokens_from_context_item(item, model)
-            tokens += num
-            if tokens > max_tokens:
-                break
-            context_tokens += num
-            i += 1
+        index = self.get_tokens_index(model)
+        n = len(self.items)
+        target = index[n] - (max_tokens - used_tokens)
 
-        return i, context_tokens
+        # first item index that still fits in the budget
+        start = bisect.bisect_left(index, target, 0, n + 1)
+        if start > n:
+            start = n
+        return self.items[start:], index[n] - index[start]
 
-    def get_prompt_items(self, model, used_tokens=100, max_tokens=1000):
+    def count_tokens(self, model):
         """
-        Returns context items to add to prompt
+        Counts tokens of all context items
+
+        :param model: model
+        :return: context tokens count
+        """
+        index = self.get_tokens_index(model)
+        return index[-1] - index[0]
+
+    def calibrate_estimate(self, model, names=None, limit=1000):
+        """
+        Calibrates tokens estimator against stored contexts (newest first)
+
+        :param model: model
+        :param names: contexts names (ids) to read samples from (None = all)
+        :param limit: max number of sample texts
+        :return: estimator params dict or None if not enough samples
+        """
+        if names is None:
+            names = list(self.get_list())
+        texts = []
+        for name in names:
+            frame = self.load_frame(name)
+            for input, output in zip(frame.column('input'), frame.column('output')):
+                texts.append(input)
+                texts.append(output)
+            if len(texts) >= limit:
+                break
+        return calibrate_estimate(texts[:limit], model)
+
+    def count_prompt_items(self, model, used_tokens=100, max_tokens=1000):
+        """
+        Counts context items to add to prompt (cached until items change)
 
         :param model: model
         :param used_tokens: used tokens
         :param max_tokens: max tokens
-        :return: context items list
+        :return: context items count, context tokens count
         """
-        items = []
-        # loop on items from end to start
-        tokens = used_tokens
-        for item in reversed(self.items):
-            tokens += num_tokens_from_context_item(item, model)
-            if tokens > max_tokens:
-                break
-            items.append(item)
+        key = (self.version, model, used_tokens, max_tokens)
+        if self.prompt_counts is not None and self.prompt_counts[0] == key:
+            return self.prompt_counts[1]
+        items, context_tokens = self.get_prompt_plan(model, used_tokens, max_tokens)
+        self.prompt_counts = (key, (len(items), context_tokens))
+        return self.prompt_counts[1]
 
-        # reverse items
-        items.reverse()
-        return items
+    def changed(self):
+        """Marks items as changed (invalidates cached prompt counts)"""
+        self.version += 1
 
     def clear(self):
         """Clears context"""
-        self.items = []
+        self.items = ContextDeque()
+        self.items_ctx = None
+        self.has_more = False
+        self.reset_tokens_index()
+        self.changed()
 
     def select(self, name):
         """
@@ -281,8 +535,101 @@ class Context:
         :param name: context name (id)
         """
         if name in self.contexts:
+            self.cache_items()
             self.current_ctx = name
-            self.items = self.load(name)
+            self.items_ctx = name
+            self.has_more = False
+            cached = self.get_cached(name)
+            if cached is not None:
+                items, self.has_more = cached
+            else:
+                items, self.has_more = self.load_items(name)
+            self.items = ContextDeque(items)
+            self.reset_tokens_index()
+            self.changed()
+            self.warm_tokens(self.items)
+            self.load_budget(self.config.data['model'], self.config.data['max_total_tokens'])
+
+    def load_items(self, name):
+        """
+        Loads context items, only newest items covering tokens budget if lazy loading is enabled
+
+        :param name: context name (id)
+        :return: (items, has_more)
+        """
+        if not self.is_lazy():
+            items = self.load(name)
+            self.warm_tokens(items)
+            return items, False
+
+        model = self.config.data['model']
+        max_tokens = self.config.data['max_total_tokens']
+        limit = self.config.data['ctx_lazy_items']
+        items = []
+        has_more = True
+        tokens = 0
+        while has_more and tokens < max_tokens:
+            before = None
+            if len(items) > 0:
+                before = items[0].id
+            older = self.load_tail(name, limit, before)
+            has_more = len(older) >= limit
+            self.warm_tokens(older)
+            for item in older:
+                tokens += num_tokens_from_context_item(item, model)
+            items = older + items
+        return items, has_more
+
+    def load_more(self, limit=None):
+        """
+        Loads older items of current context (lazy loading)
+
+        :param limit: max number of items (None = from config)
+        :return: loaded items
+        """
+        if not self.has_more or self.current_ctx is None:
+            return []
+        if limit is None:
+            limit = self.config.data['ctx_lazy_items']
+        before = None
+        if len(self.items) > 0:
+            before = self.items[0].id
+        items = self.load_tail(self.current_ctx, limit, before)
+        self.has_more = len(items) >= limit
+        if len(items) > 0:
+            self.items.prepend(items)
+            self.reset_tokens_index()  # prefix sums start at first item
+            self.changed()
+            self.warm_tokens(items)
+        return items
+
+    def load_budget(self, model, max_tokens):
+        """
+        Loads older items until loaded items cover tokens budget (all items that can be used in prompt)
+
+        :param model: model
+        :param max_tokens: max tokens
+        """
+        while self.has_more and self.count_tokens(model) < max_tokens:
+            if len(self.load_more()) == 0:
+                break
+
+    def load_all(self):
+        """Loads all not loaded items of current context"""
+        while self.has_more:
+            if len(self.load_more()) == 0:
+                break
+
+    def warm_tokens(self, items):
+        """
+        Counts tokens of items not counted yet (in parallel batch) to fill items tokens cache
+
+        :param items: context items
+        """
+        try:
+            num_tokens_from_context_items(items, self.config.data['model'])
+        except Exception as e:
+            print(e)
 
     def add(self, item):
         """
@@ -290,15 +637,32 @@ class Context:
 
         :param item: item to add
         """
+        last = self.get_last()
+        if last is not None and last.id is not None:
+            item.id = last.id + 1
+        else:
+            item.id = 1
+        self.warm_tokens([item])  # counted before saving, so tokens cache is stored with item
         self.items.append(item)  # add item to context
+        self.changed()
 
-        # save context to file
-        self.store()
+        # save item to storage
+        if self.is_current_stored():
+            try:
+                self.storage.append(self.current_ctx, self.items, item)
+            except Exception as e:
+                print(e)
 
-    def store(self):
-        """Stores current context to file"""
-        if self.current_ctx is not None and self.current_ctx in self.contexts:
-            self.dump_context(self.current_ctx)
+    def is_current_stored(self):
+        """
+        Checks if current context should be written to storage
+
+        :return: True if current context exists and storing is enabled
+        """
+        if not self.is_store() or self.current_ctx is None or self.current_ctx not in self.contexts:
+            return False
+        self.init_storage()
+        return True
 
     def get_total_tokens(self):
         """
@@ -358,23 +722,85 @@ class Context:
 
     def check(self, threshold, max_total):
         """
-        Checks context and clear if limit exceeded
+        Checks context and removes oldest items if limit exceeded (until threshold is free again)
 
         :param threshold: threshold
         :param max_total: max total tokens
         """
-        if self.get_tokens_left(max_total) <= threshold:
-            self.remove_first()
+        overflow = threshold - self.get_tokens_left(max_total)
+        if overflow < 0:
+            return
+        model = self.config.data['model']
+        tokens = self.count_tokens(model)
+        self.trim(model, min(tokens - overflow, tokens - 1))  # at least one item
+
+    def trim(self, model, max_tokens):
+        """
+        Removes oldest items until context tokens fit in max tokens
+
+        Older items are loaded only until budget is exceeded (lazy loading), the rest is removed without loading
+
+        :param model: model
+        :param max_tokens: max context tokens
+        :return: number of removed loaded items
+        """
+        self.load_budget(model, max_tokens + 1)
+        index = self.get_tokens_index(model)
+        n = len(self.items)
+        num = bisect.bisect_left(index, index[n] - max_tokens, 0, n + 1)
+        if num > n:
+            num = n
+        if num > 0:
+            self.remove_older()
+            self.remove_first(num)
+        return num
+
+    def remove_older(self):
+        """Removes not loaded (older) items of current context from storage without loading them"""
+        if not self.has_more:
+            return
+        self.has_more = False
+        if len(self.items) > 0 and self.is_current_stored():
+            try:
+                self.storage.remove_before(self.current_ctx, self.items[0].id)
+            except Exception as e:
+                print(e)
 
     def remove_last(self):
         """Removes last item"""
         if len(self.items) > 0:
-            self.items.pop()
+            item = self.items.pop()
+            self.truncate_tokens_index(len(self.items))
+            self.changed()
+            self.store_removed(item)
 
-    def remove_first(self):
-        """Removes first item"""
-        if len(self.items) > 0:
-            self.items.pop(0)
+    def remove_first(self, num=1):
+        """
+        Removes first items
+
+        :param num: number of items to remove
+        """
+        self.load_all()  # oldest items may be not loaded yet (lazy loading)
+        items = self.items.popleft(num)
+        self.changed()
+        if len(items) < len(self.tokens_index):
+            self.tokens_index.popleft(len(items))  # sums are used as differences, no rebase needed
+        else:
+            self.tokens_index = ContextDeque([0])
+        for item in items:
+            self.store_removed(item)
+
+    def store_removed(self, item):
+        """
+        Removes item from current context storage
+
+        :param item: removed item
+        """
+        if self.is_current_stored():
+            try:
+                self.storage.remove(self.current_ctx, self.items, item)
+            except Exception as e:
+                print(e)
 
     def get_last_tokens(self):
         """
@@ -389,12 +815,16 @@ class Context:
 
 
 class ContextItem:
+    __slots__ = ('id', 'input', 'output', 'mode', 'input_name', 'output_name', 'input_timestamp', 'output_timestamp',
+                 'input_tokens', 'output_tokens', 'total_tokens', 'tokens_cache')
+
     def __init__(self, mode=None):
         """
         Context item
 
         :param mode: Mode (completion or chat)
         """
+        self.id = None
         self.input = None
         self.output = None
         self.mode = mode
@@ -405,6 +835,7 @@ class ContextItem:
         self.input_tokens = 0
         self.output_tokens = 0
         self.total_tokens = 0
+        self.tokens_cache = {}  # content tokens per encoding name
 
     def set_input(self, input, name=None):
         """
@@ -413,6 +844,8 @@ class ContextItem:
         :param input: Input text (prompt)
         :param name: Input person name
         """
+        if input != self.input or name != self.input_name:
+            self.tokens_cache = {}
         self.input = input
         self.input_name = name
         self.input_timestamp = int(time.time())
@@ -424,6 +857,8 @@ class ContextItem:
         :param output: Output text
         :param name: Output person name
         """
+        if output != self.output or name != self.output_name:
+            self.tokens_cache = {}
         self.output = output
         self.output_name = name
         self.output_timestamp = int(time.time())
@@ -446,6 +881,7 @@ class ContextItem:
         :return: serialized item
         """
         return {
+            'id': self.id,
             'input': self.input,
             'output': self.output,
             'mode': self.mode,
@@ -455,11 +891,14 @@ class ContextItem:
             'output_tokens': self.output_tokens,
             'total_tokens': self.total_tokens,
             'input_timestamp': self.input_timestamp,
-            'output_timestamp': self.output_timestamp
+            'output_timestamp': self.output_timestamp,
+            'tokens_cache': self.tokens_cache.copy()
         }
 
     def deserialize(self, data):
         """Deserializes item from dict"""
+        if 'id' in data:
+            self.id = data['id']
         if 'input' in data:
             self.input = data['input']
         if 'output' in data:
@@ -480,3 +919,5 @@ class ContextItem:
             self.input_timestamp = data['input_timestamp']
         if 'output_timestamp' in data:
             self.output_timestamp = data['output_timestamp']
+        if 'tokens_cache' in data and isinstance(data['tokens_cache'], dict):
+            self.tokens_cache = data['tokens_cache']
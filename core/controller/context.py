@@ -9,10 +9,14 @@
 # Created Date: 2023.04.09 20:00:00                  #
 # ================================================== #
 
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal, Slot
+
 from core.utils import trans
 
 
 class Context:
+    PREFETCH_DELAY = 100  # ms, hover/navigation time before neighbouring contexts are prefetched
+
     def __init__(self, window=None):
         """
         Context controller
@@ -20,6 +24,13 @@ class Context:
         :param window: main window object
         """
         self.window = window
+        self.prefetch_id = 0  # id of the latest prefetch, older prefetches are cancelled
+        self.prefetch_idx = None  # list index to prefetch around
+        self.prefetch_pool = QThreadPool()
+        self.prefetch_pool.setMaxThreadCount(1)
+        self.prefetch_timer = QTimer()
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.timeout.connect(self.start_prefetch)
 
     def setup(self):
         """Setups context"""
@@ -34,6 +45,7 @@ class Context:
                 self.window.gpt.context.current_ctx = self.window.gpt.context.get_first_ctx()
 
         self.load(self.window.gpt.context.current_ctx)
+        self.window.gpt.context.start_compressor()  # current context is skipped
 
     def new(self):
         """Creates new context"""
@@ -89,6 +101,47 @@ class Context:
         self.window.gpt.context.current_ctx = ctx
         self.load(ctx)
 
+    def prefetch(self, idx):
+        """
+        Schedules prefetch of context at list index and its neighbours (hovered or current list item)
+
+        :param idx: context index
+        """
+        if idx < 0 or self.window.config.data['ctx_cache_items'] <= 0:
+            return
+        self.prefetch_id += 1  # selection moved on, cancel prefetch in progress
+        self.prefetch_pool.clear()
+        self.prefetch_idx = idx
+        self.prefetch_timer.start(self.PREFETCH_DELAY)
+
+    def start_prefetch(self):
+        """Starts prefetching contexts on worker thread"""
+        if self.prefetch_idx is None:
+            return
+        names = []
+        for idx in [self.prefetch_idx, self.prefetch_idx + 1, self.prefetch_idx - 1]:
+            name = self.window.gpt.context.get_name_by_idx(idx) if idx >= 0 else None
+            if name is not None and not self.window.gpt.context.cache.contains(name) \
+                    and name != self.window.gpt.context.items_ctx:
+                names.append(name)
+        if len(names) == 0:
+            return
+
+        worker = PrefetchWorker(self.prefetch_id, names, self.window.gpt.context, lambda id: id != self.prefetch_id)
+        worker.signals.loaded.connect(self.handle_prefetch)
+        self.prefetch_pool.start(worker)
+
+    def handle_prefetch(self, id, name, result):
+        """
+        Caches prefetched context (on GUI thread)
+
+        :param id: prefetch id
+        :param name: context name (id)
+        :param result: (items, has_more, version)
+        """
+        items, has_more, version = result
+        self.window.gpt.context.cache_prefetched(name, items, has_more, version)
+
     def delete(self, idx, force=False):
         """
         Deletes context
@@ -149,8 +202,7 @@ class Context:
         :param ctx: context name (id)
         :param name: context name
         """
-        self.window.gpt.context.contexts[ctx]['name'] = name
-        self.window.gpt.context.dump_context(ctx)
+        self.window.gpt.context.rename(ctx, name)
         self.window.dialog['ctx.rename'].close()
         self.update()
 
@@ -166,3 +218,39 @@ class Context:
         """
         self.window.gpt.context.add(ctx)
         self.update()
+
+
+class PrefetchSignals(QObject):
+    loaded = Signal(int, str, object)
+
+
+class PrefetchWorker(QRunnable):
+    def __init__(self, id, names, context, is_cancelled):
+        """
+        Contexts prefetch worker
+
+        :param id: prefetch id
+        :param names: contexts names (ids) to load, in order
+        :param context: context object
+        :param is_cancelled: callable returning True if prefetch with given id is cancelled
+        """
+        super().__init__()
+        self.signals = PrefetchSignals()
+        self.id = id
+        self.names = names
+        self.context = context
+        self.is_cancelled = is_cancelled
+
+    @Slot()
+    def run(self):
+        """Loads and parses contexts"""
+        for name in self.names:
+            if self.is_cancelled(self.id):
+                return
+            try:
+                result = self.context.prefetch(name)
+            except Exception as e:
+                print(e)
+                continue
+            if result is not None:
+                self.signals.loaded.emit(self.id, name, result)
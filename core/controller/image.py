@@ -51,12 +51,25 @@ class Image:
         # create ctx item
         ctx = ContextItem()
         ctx.set_input(text, self.window.config.data['user_name'])
-        self.window.gpt.context.add(ctx)
         self.window.controller.output.append_input(ctx)
 
         # call DALL-E 2 API and generate images
+        worker = self.window.controller.input.create_worker(lambda: self.window.images.generate(text, num_of_images))
+        worker.signals.finished.connect(lambda id, paths: self.handle_finished(id, ctx, paths))
+        worker.signals.error.connect(self.window.controller.input.handle_error)
+        self.window.controller.input.start(worker)
+
+    def handle_finished(self, id, ctx, paths):
+        """
+        Handles generated images (on GUI thread)
+
+        :param id: request id
+        :param ctx: context item
+        :param paths: images paths
+        """
+        if self.window.controller.input.is_cancelled(id):
+            return
         try:
-            paths = self.window.images.generate(text, num_of_images)
             string = ""
             i = 1
             for path in paths:
@@ -64,13 +77,14 @@ class Image:
                 i += 1
             self.open_images(paths)
             ctx.set_output(string.strip())
+            self.window.gpt.context.add(ctx)
             self.window.controller.output.append_output(ctx)
-            self.window.gpt.context.store()
             self.window.set_status("OK.")
         except Exception as e:
             print(e)
             self.window.ui.dialogs.alert(str(e))
             self.window.set_status(trans('status.error'))
+        self.window.controller.input.finish()
 
     def open_images(self, paths):
         """
@@ -9,13 +9,21 @@
 # Created Date: 2023.04.09 20:00:00                  #
 # ================================================== #
 
+from collections import deque
+
+import openai
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
 from PySide6.QtGui import QTextCursor
 
 from core.context import ContextItem
+from core.session import is_idle, touch, prewarm, set_handle, RequestHandle
 from core.utils import trans
 
 
 class Input:
+    MAX_WORKERS = 2  # cancelled requests are aborted, one worker is left for pre-warm
+    CLOSE_TIMEOUT = 1000  # ms, max time to wait for workers on close
+
     def __init__(self, window=None):
         """
         Input controller
@@ -23,6 +31,17 @@ class Input:
         :param window: main window
         """
         self.window = window
+        self.busy = False  # request in progress
+        self.queue = deque()  # (mode, text) prompts waiting for sending
+        self.request_id = 0  # id of current request, changed on cancel
+        self.handle = None  # handle of current request, used to abort it
+        self.stream = False  # stream output of current request is begun
+        self.stream_text = None
+        self.stream_ctx = None
+        self.stream_request = None
+        self.stream_output = []  # output chunks received in current stream
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(self.MAX_WORKERS)
 
     def setup(self):
         """Setups input"""
@@ -56,34 +75,225 @@ class Input:
         """
         self.window.config.data['send_shift_enter'] = value
 
-    def send_text(self, text):
+    def send_text(self, text, mode):
         """
-        Sends text to GPT
+        Sends text to GPT (request is executed on worker thread)
 
         :param text: text to send
+        :param mode: mode selected when text was queued
         """
         self.window.set_status(trans('status.sending'))
 
         # create ctx item
-        ctx = ContextItem()
+        ctx = ContextItem(mode)
         ctx.set_input(text, self.window.config.data['user_name'])
         self.window.controller.output.append_input(ctx)
 
-        # call GPT
+        # prepare request (context and config are read on GUI thread only)
+        stream = self.window.config.data['stream']
+        request = self.window.gpt.prepare(text, mode, stream)
+        if request is None:
+            self.window.set_status(trans('status.error'))  # mode not supported
+            self.finish()
+            return
+
+        # send request on worker thread
+        if stream:
+            self.stream_text = text
+            self.stream_ctx = ctx
+            self.stream_request = request
+            self.stream_output = []
+            self.window.controller.output.begin_stream()
+            self.stream = True  # set only when stream output is begun
+            worker = self.create_worker(lambda: self.window.gpt.request_stream(request), True)
+            worker.signals.chunk.connect(self.handle_chunk)
+        else:
+            worker = self.create_worker(lambda: self.window.gpt.request(request))
+        worker.signals.finished.connect(lambda id, result: self.handle_finished(id, text, ctx, result))
+        worker.signals.error.connect(self.handle_error)
+        self.start(worker)
+
+    def handle_chunk(self, id, chunk):
+        """
+        Handles streamed output chunk (on GUI thread)
+
+        :param id: request id
+        :param chunk: output text chunk
+        """
+        if self.is_cancelled(id):
+            return
+        self.stream_output.append(chunk)
+        self.window.controller.output.append_stream(chunk)
+
+    def handle_finished(self, id, text, ctx, result):
+        """
+        Handles GPT response (on GUI thread)
+
+        :param id: request id
+        :param text: sent text
+        :param ctx: context item
+        :param result: result dict or None if error
+        """
+        if self.is_cancelled(id):
+            return
+        if self.stream:
+            self.window.controller.output.end_stream()
+        if result is None:
+            self.window.set_status(trans('status.error'))
+        else:
+            try:
+                ctx = self.window.gpt.finish(text, ctx, result)
+                if not self.stream:
+                    self.window.controller.output.append_output(ctx)
+                self.window.set_status(self.get_status(ctx, result))
+            except Exception as e:
+                print(e)
+                self.window.set_status(trans('status.error'))
+        self.finish()
+
+    def handle_error(self, id, e):
+        """
+        Handles request error (on GUI thread)
+
+        :param id: request id
+        :param e: exception
+        """
+        if self.is_cancelled(id):
+            return
+        if self.stream:
+            self.window.controller.output.end_stream()
+        print(e)
+        self.window.ui.dialogs.alert(str(e))
+        self.window.set_status(trans('status.error'))
+        self.finish()
+
+    def cancel(self):
+        """
+        Cancels request in progress and queued prompts
+
+        Connection of cancelled request is aborted and its result is ignored (context is not changed),
+        output streamed before cancel is stored if enabled in config
+        """
+        if not self.busy:
+            return
+        self.queue.clear()
+        self.request_id += 1  # results of cancelled request are ignored
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        if self.stream:
+            self.window.controller.output.end_stream()
+            output = "".join(self.stream_output)
+            if self.window.config.data['stream_keep_cancelled'] and output.strip() != "":
+                try:
+                    self.window.gpt.finish_partial(self.stream_text, self.stream_ctx, self.stream_request, output)
+                except Exception as e:
+                    print(e)
+        self.window.set_status(trans('status.cancelled'))
+        self.finish()
+
+    def close(self):
+        """
+        Cancels request in progress and waits for workers (on app close)
+        """
+        self.cancel()
+        self.pool.waitForDone(self.CLOSE_TIMEOUT)
+
+    def get_status(self, ctx, result):
+        """
+        Returns status text with tokens usage (and time to first token in stream mode)
+
+        :param ctx: context item
+        :param result: result dict
+        :return: status text
+        """
+        status = trans('status.tokens') + ": {} + {} = {}".format(ctx.input_tokens, ctx.output_tokens,
+                                                                   ctx.total_tokens)
+        if result['ttft'] is not None:
+            status += ", " + trans('status.first_token') + ": {:.2f} s".format(result['ttft'])
+        return status
+
+    def create_worker(self, call, stream=False):
+        """
+        Creates request worker (request becomes current request)
+
+        :param call: callable executing request
+        :param stream: call returns output chunks generator
+        :return: request worker
+        """
+        self.request_id += 1
+        self.handle = RequestHandle()
+        return RequestWorker(self.request_id, call, self.is_cancelled, self.handle, stream)
+
+    def is_cancelled(self, id):
+        """
+        Checks if request is cancelled (thread-safe)
+
+        :param id: request id
+        :return: True if request is not current request
+        """
+        return id != self.request_id
+
+    def start(self, worker):
+        """
+        Starts request worker
+
+        :param worker: request worker
+        """
+        self.pool.start(worker)
+
+    def finish(self):
+        """
+        Finishes request, sends next queued prompt
+        """
+        self.handle = None
+        self.set_busy(False)
+        self.window.controller.ui.update()
+        self.dispatch()
+
+    def set_busy(self, busy):
+        """
+        Sets busy state (request in progress), contexts cannot be switched while busy
+
+        :param busy: True if request in progress
+        """
+        self.busy = busy
+        self.window.data['ctx.contexts'].setEnabled(not busy)
+        self.window.data['contexts.new'].setEnabled(not busy)
+        self.window.data['input.cancel_btn'].setEnabled(busy)
+
+    def dispatch(self):
+        """
+        Sends next queued prompt if not busy
+        """
+        if self.busy or len(self.queue) == 0:
+            return
+        mode, text = self.queue.popleft()
+        self.set_busy(True)
+        self.stream = False  # no stream output begun yet
+
+        # prepare context
+        if len(self.window.gpt.context.contexts) == 0:
+            self.window.gpt.context.new()
+            self.window.controller.context.update()
+
+        # send to API
         try:
-            ctx = self.window.gpt.call(text, ctx)
-            self.window.controller.output.append_output(ctx)
-            self.window.gpt.context.store()
-            self.window.set_status(
-                trans('status.tokens') + ": {} + {} = {}".format(ctx.input_tokens, ctx.output_tokens, ctx.total_tokens))
+            if mode == 'img':
+                self.window.controller.image.send_text(text)
+            else:
+                self.send_text(text, mode)
         except Exception as e:
-            print(e)
-            self.window.ui.dialogs.alert(str(e))
-            self.window.set_status(trans('status.error'))
+            self.handle_error(self.request_id, e)
+            return
+
+        if len(self.queue) > 0:
+            self.window.set_status(trans('status.sending') + " " + trans('status.queued') + ": {}".format(
+                len(self.queue)))
 
     def send(self):
         """
-        Sends input text to API
+        Sends input text to API (queued if other request is in progress)
         """
         text = self.window.data['input'].toPlainText().strip()
         if len(text) > 0:
@@ -100,19 +310,23 @@ class Input:
             self.window.gpt.init()
             self.window.images.init()
 
-            # prepare context
-            if len(self.window.gpt.context.contexts) == 0:
-                self.window.gpt.context.new()
-                self.window.controller.context.update()
-
-            # send to API
-            if self.window.config.data['mode'] == 'img':
-                self.window.controller.image.send_text(text)
-            else:
-                self.window.controller.input.send_text(text)
+            self.queue.append((self.window.config.data['mode'], text))
+            if self.busy:
+                self.window.set_status(trans('status.queued') + ": {}".format(len(self.queue)))
+            self.dispatch()
 
         self.window.controller.ui.update()
 
+    def prewarm(self):
+        """
+        Pre-warms API connection when typing starts after idle period (if enabled)
+        """
+        if not self.window.config.data['http_prewarm'] \
+                or not is_idle(self.window.config.data['http_prewarm_idle']):
+            return
+        touch()  # once per idle period
+        self.pool.start(PrewarmWorker(self.window.config, openai.api_base))
+
     def append(self, text):
         """
         Appends text to input
@@ -128,3 +342,83 @@ class Input:
             if sep:  # New line if LF
                 cur.insertBlock()
         self.window.data['input'].setTextCursor(cur)  # Update visible cursor
+
+
+class RequestSignals(QObject):
+    chunk = Signal(int, str)
+    finished = Signal(int, object)
+    error = Signal(int, object)
+
+
+class RequestWorker(QRunnable):
+    def __init__(self, id, call, is_cancelled, handle, stream=False):
+        """
+        API request worker
+
+        :param id: request id
+        :param call: callable executing request, returns result (or chunks generator if stream)
+        :param is_cancelled: callable returning True if request with given id is cancelled
+        :param handle: request handle (connections used by call are aborted on cancel)
+        :param stream: call returns generator, its chunks are emitted as they arrive
+        """
+        super().__init__()
+        self.signals = RequestSignals()
+        self.id = id
+        self.call = call
+        self.is_cancelled = is_cancelled
+        self.handle = handle
+        self.stream = stream
+
+    @Slot()
+    def run(self):
+        """Executes request"""
+        set_handle(self.handle)
+        try:
+            if self.stream:
+                result = self.read_stream(self.call())
+            else:
+                result = self.call()
+        except Exception as e:
+            if not self.is_cancelled(self.id):  # aborted request fails with connection error
+                self.signals.error.emit(self.id, e)
+            return
+        finally:
+            set_handle(None)
+        if not self.is_cancelled(self.id):
+            self.signals.finished.emit(self.id, result)
+
+    def read_stream(self, generator):
+        """
+        Emits stream chunks, stream is closed when request is cancelled
+
+        :param generator: output chunks generator
+        :return: generator return value (None if cancelled)
+        """
+        while not self.is_cancelled(self.id):
+            try:
+                self.signals.chunk.emit(self.id, next(generator))
+            except StopIteration as e:
+                return e.value
+        generator.close()
+        return None
+
+
+class PrewarmWorker(QRunnable):
+    def __init__(self, config, url):
+        """
+        Connection pre-warm worker
+
+        :param config: config object
+        :param url: API base URL
+        """
+        super().__init__()
+        self.config = config
+        self.url = url
+
+    @Slot()
+    def run(self):
+        """Opens connection to API host"""
+        try:
+            prewarm(self.config, self.url)
+        except Exception as e:
+            print(e)
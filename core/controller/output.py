@@ -10,8 +10,11 @@
 # ================================================== #
 
 from datetime import datetime
+from PySide6.QtCore import QTimer
 from PySide6.QtGui import QTextCursor
 
+FRAME_DELAY = 16  # ms, streamed output is rendered at most once per frame
+
 
 class Output:
     def __init__(self, window=None):
@@ -21,6 +24,10 @@ class Output:
         :param window: main window
         """
         self.window = window
+        self.stream_buffer = []
+        self.stream_timer = QTimer()
+        self.stream_timer.setSingleShot(True)
+        self.stream_timer.timeout.connect(self.flush_stream)
 
     def setup(self):
         """Setups output"""
@@ -48,31 +55,76 @@ class Output:
         self.append_input(item)
         self.append_output(item)
 
-    def append_input(self, item):
+    def prepend_context(self):
         """
-        Appends input to output
+        Loads older context items and prepends them to output (keeps scroll position)
+        """
+        items = self.window.gpt.context.load_more()
+        if len(items) == 0:
+            return
+        bar = self.window.data['output'].verticalScrollBar()
+        distance = bar.maximum() - bar.value()
+        cur = QTextCursor(self.window.data['output'].document())
+        cur.movePosition(QTextCursor.Start)
+        for item in items:
+            self.insert(cur, self.format_input(item))
+            self.insert(cur, self.format_output(item))
+        bar.setValue(bar.maximum() - distance)
+        self.window.controller.ui.update()
+
+    def handle_scroll(self, value):
+        """
+        Loads older context items when output is scrolled to the top
+
+        :param value: scrollbar value
+        """
+        if value > self.window.data['output'].verticalScrollBar().minimum() \
+                or not self.window.gpt.context.has_more \
+                or self.window.data['output'].document().isEmpty():
+            return
+        self.prepend_context()
+
+    def format_input(self, item):
+        """
+        Formats input text
 
         :param item: context item
+        :return: formatted text
         """
         if self.window.config.data['output_timestamp'] and item.input_timestamp is not None:
             ts = datetime.fromtimestamp(item.input_timestamp)
             hour = ts.strftime("%H:%M:%S")
-            self.append("{}: > {}".format(hour, item.input))
-        else:
-            self.append("> {}".format(item.input))
+            return "{}: > {}".format(hour, item.input)
+        return "> {}".format(item.input)
 
-    def append_output(self, item):
+    def format_output(self, item):
         """
-        Appends output to output
+        Formats output text
 
         :param item: context item
+        :return: formatted text
         """
         if self.window.config.data['output_timestamp'] and item.output_timestamp is not None:
             ts = datetime.fromtimestamp(item.output_timestamp)
             hour = ts.strftime("%H:%M:%S")
-            self.append("{}: {}".format(hour, item.output) + "\n")
-        else:
-            self.append(item.output + "\n")
+            return "{}: {}".format(hour, item.output) + "\n"
+        return item.output + "\n"
+
+    def append_input(self, item):
+        """
+        Appends input to output
+
+        :param item: context item
+        """
+        self.append(self.format_input(item))
+
+    def append_output(self, item):
+        """
+        Appends output to output
+
+        :param item: context item
+        """
+        self.append(self.format_output(item))
 
     def append(self, text):
         """
@@ -82,13 +134,78 @@ class Output:
         """
         cur = self.window.data['output'].textCursor()  # Move cursor to end of text
         cur.movePosition(QTextCursor.End)
-        s = str(text) + "\n"
+        self.insert(cur, text)
+        self.window.data['output'].setTextCursor(cur)  # Update visible cursor
+
+    def begin_stream(self):
+        """
+        Begins streamed output (appends timestamp if enabled)
+        """
+        self.stream_buffer = []
+        if self.window.config.data['output_timestamp']:
+            self.append_text(datetime.now().strftime("%H:%M:%S") + ": ")
+
+    def append_stream(self, text):
+        """
+        Appends streamed output chunk (buffered, rendered once per frame)
+
+        :param text: output text chunk
+        """
+        self.stream_buffer.append(text)
+        if not self.stream_timer.isActive():
+            self.stream_timer.start(FRAME_DELAY)
+
+    def flush_stream(self):
+        """
+        Renders buffered output chunks
+        """
+        self.stream_timer.stop()
+        if len(self.stream_buffer) == 0:
+            return
+        text = "".join(self.stream_buffer)
+        self.stream_buffer = []
+        self.append_text(text)
+
+    def end_stream(self):
+        """
+        Ends streamed output (renders remaining chunks)
+        """
+        self.flush_stream()
+        self.append_text("\n\n")
+
+    def append_text(self, text):
+        """
+        Appends raw text to output (without new line at the end)
+
+        :param text: text to append
+        """
+        cur = self.window.data['output'].textCursor()  # Move cursor to end of text
+        cur.movePosition(QTextCursor.End)
+        self.insert_text(cur, text)
+        self.window.data['output'].setTextCursor(cur)  # Update visible cursor
+
+    def insert(self, cur, text):
+        """
+        Inserts text line at cursor
+
+        :param cur: text cursor
+        :param text: text to insert
+        """
+        self.insert_text(cur, str(text) + "\n")
+
+    def insert_text(self, cur, text):
+        """
+        Inserts raw text at cursor
+
+        :param cur: text cursor
+        :param text: text to insert
+        """
+        s = str(text)
         while s:
             head, sep, s = s.partition("\n")  # Split line at LF
             cur.insertText(head)  # Insert text at cursor
             if sep:  # New line if LF
                 cur.insertBlock()
-        self.window.data['output'].setTextCursor(cur)  # Update visible cursor
 
     def toggle_timestamp(self, value):
         """
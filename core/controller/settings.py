@@ -33,6 +33,8 @@ class Settings:
         if id == "settings":
             self.window.config.data['api_key'] = self.window.config_option['api_key'].text()
             self.window.config.data['img_resolution'] = self.window.config_option['img_resolution'].text()
+            self.window.gpt.init()  # API key may be changed
+            self.window.images.init()
 
         info = trans('info.settings.saved')
         self.window.config.save_config()
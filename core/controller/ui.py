@@ -9,11 +9,16 @@
 # Created Date: 2023.04.09 20:00:00                  #
 # ================================================== #
 
-from core.tokens import num_tokens_prompt, num_tokens_extra
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal, Slot
+
+from core.tokens import num_tokens_prompt, num_tokens_extra, num_tokens_from_string, num_tokens_estimate, \
+    get_tokens_values, get_encoding, set_estimate_values, is_estimate_calibrated
 from core.utils import trans
 
 
 class UI:
+    COUNTER_DELAY = 150  # ms, debounce interval for tokens counters
+
     def __init__(self, window=None):
         """
         UI update controller
@@ -21,28 +26,225 @@ class UI:
         :param window: main UI window object
         """
         self.window = window
+        self.counter_id = 0  # id of the latest counters computation, older results are discarded
+        self.counter_cache = {}  # last counted system prompt: (text, user_name, model, estimate, tokens)
+        self.input_mode = None  # (model, estimate) used to count tokens stored in input blocks
+        self.calibrated = []  # encodings with calibration already attempted
+        self.counter_pool = QThreadPool()
+        self.counter_pool.setMaxThreadCount(1)
+        self.calibrate_pool = QThreadPool()
+        self.calibrate_pool.setMaxThreadCount(1)
+        self.counter_timer = QTimer()
+        self.counter_timer.setSingleShot(True)
+        self.counter_timer.timeout.connect(self.start_counters)
 
     def setup(self):
         """Setups UI"""
+        set_estimate_values(self.window.config.data['tokens_estimate_calibration'])
+        self.window.data['input'].document().contentsChange.connect(self.handle_input_change)
         self.update()
 
+    def handle_input_change(self, position, removed, added):
+        """
+        Invalidates tokens counted for edited input blocks
+
+        Tokens of each input block (paragraph) are kept in block user state, -1 means not counted yet
+
+        :param position: change position
+        :param removed: removed chars
+        :param added: added chars
+        """
+        document = self.window.data['input'].document()
+        block = document.findBlock(position)
+        end = document.findBlock(position + added)
+        while block.isValid():
+            block.setUserState(-1)
+            if block == end:
+                break
+            block = block.next()
+
+        self.counter_id += 1  # block numbers may have changed, discard results in progress
+        self.update_counters()
+
     def update(self):
         """Updates UI"""
         self.update_counters()
 
     def update_counters(self):
-        """Updates tokens counters"""
+        """Schedules tokens counters update (coalesces calls made within debounce interval)"""
+        self.counter_timer.start(self.COUNTER_DELAY)
+
+    def start_counters(self):
+        """Starts tokens counting, tokenizes changed input blocks and system prompt on worker thread"""
         model = self.window.config.data['model']
         user_name = self.window.config.data['user_name']
-        max_total_tokens = self.window.config.data['max_total_tokens']
-        extra_tokens = num_tokens_extra(model)
+        prompt = self.window.config.data['prompt']
+        estimate = self.window.config.data['tokens_estimate']
+
+        self.counter_id += 1
+        self.counter_pool.clear()  # drop stale pending computations
+
+        if estimate:
+            self.calibrate_estimate(model)
+
+        # reuse tokens of unchanged system prompt
+        texts = {}
+        prompt_tokens = 0
+        if self.is_counter_cached('prompt', prompt, user_name, model, estimate):
+            prompt_tokens = self.counter_cache['prompt'][4]
+        else:
+            texts['prompt'] = prompt
+
+        # reuse tokens of unchanged input blocks
+        blocks = self.get_input_dirty_blocks(model, estimate)
+
+        if len(texts) == 0 and len(blocks) == 0:
+            self.apply_counters(self.get_input_tokens(user_name, model), prompt_tokens)
+            return
+
+        worker = CounterWorker(self.counter_id, texts, blocks, user_name, model, estimate)
+        worker.signals.finished.connect(self.handle_counters)
+        self.counter_pool.start(worker)
+
+    def calibrate_estimate(self, model):
+        """
+        Starts calibrating tokens estimator against stored contexts on worker thread (once per encoding)
+
+        :param model: model name
+        """
+        name = get_encoding(model).name
+        if name in self.calibrated or is_estimate_calibrated(model):
+            return
+        self.calibrated.append(name)
+        names = list(self.window.gpt.context.get_list())
+        worker = CalibrateWorker(name, model, names, self.window.gpt.context)
+        worker.signals.finished.connect(self.handle_calibrated)
+        self.calibrate_pool.start(worker)
+
+    def handle_calibrated(self, name, values):
+        """
+        Stores estimator calibration computed on worker thread
+
+        :param name: encoding name
+        :param values: estimator params dict or None if not enough samples
+        """
+        if values is None:
+            return
+        self.window.config.data['tokens_estimate_calibration'][name] = values
+        self.window.config.save()
+        self.update_counters()
+
+    def get_input_dirty_blocks(self, model, estimate=False):
+        """
+        Returns input blocks that need to be tokenized
+
+        :param model: model name
+        :param estimate: estimate tokens instead of encoding
+        :return: list of (block number, block text)
+        """
+        document = self.window.data['input'].document()
+        reset = (model, estimate) != self.input_mode
+        self.input_mode = (model, estimate)
+
+        blocks = []
+        block = document.begin()
+        while block.isValid():
+            if reset:
+                block.setUserState(-1)
+            if block.userState() < 0:
+                blocks.append((block.blockNumber(), block.text()))
+            block = block.next()
+        return blocks
+
+    def get_input_tokens(self, user_name, model):
+        """
+        Returns input tokens summed from input blocks
+
+        Blank blocks at the beginning and at the end are skipped (input is stripped before sending)
+
+        :param user_name: user name
+        :param model: model name
+        :return: input tokens
+        """
+        document = self.window.data['input'].document()
+
+        # first and last not blank block
+        first = None
+        last = None
+        block = document.begin()
+        while block.isValid():
+            if block.text().strip() != "":
+                if first is None:
+                    first = block.blockNumber()
+                last = block.blockNumber()
+            block = block.next()
+        if first is None:
+            return num_tokens_prompt("", user_name, model)
+
+        num_tokens = 0
+        block = document.findBlockByNumber(first)
+        while block.isValid() and block.blockNumber() <= last:
+            if block.userState() > 0:
+                num_tokens += block.userState()
+            block = block.next()
+        num_tokens += last - first  # new lines between blocks
+
+        values = get_tokens_values(model)
+        if user_name is not None and user_name != "":
+            return num_tokens + values['per_message'] + values['per_name']
+        return num_tokens + values['per_message']
+
+    def is_counter_cached(self, key, text, user_name, model, estimate=False):
+        """
+        Checks if text tokens are already counted
+
+        :param key: counter key
+        :param text: text
+        :param user_name: user name
+        :param model: model name
+        :param estimate: estimate tokens instead of encoding
+        :return: True if cached
+        """
+        if key not in self.counter_cache:
+            return False
+        cached = self.counter_cache[key]
+        return cached[0] == text and cached[1] == user_name and cached[2] == model and cached[3] == estimate
+
+    def handle_counters(self, id, result):
+        """
+        Handles counters computed on worker thread
+
+        :param id: computation id
+        :param result: dict with counted texts and input blocks
+        """
+        if id != self.counter_id:
+            return  # stale, document or config changed in the meantime
+
+        # store tokens in input blocks
+        document = self.window.data['input'].document()
+        for number, tokens in result['blocks']:
+            block = document.findBlockByNumber(number)
+            if block.isValid():
+                block.setUserState(tokens)
+
+        user_name = result['user_name']
+        model = result['model']
+        for key in result['texts']:
+            self.counter_cache[key] = (result['texts'][key], user_name, model, result['estimate'],
+                                       result['tokens'][key])
 
-        # prompt tokens
-        prompt_tokens = num_tokens_prompt(self.window.config.data['prompt'], user_name, model)
+        self.apply_counters(self.get_input_tokens(user_name, model), self.counter_cache['prompt'][4])
 
-        # input tokens
-        input_text = self.window.data['input'].toPlainText().strip()
-        input_tokens = num_tokens_prompt(input_text, user_name, model)
+    def apply_counters(self, input_tokens, prompt_tokens):
+        """
+        Updates tokens counters
+
+        :param input_tokens: input tokens
+        :param prompt_tokens: system prompt tokens
+        """
+        model = self.window.config.data['model']
+        max_total_tokens = self.window.config.data['max_total_tokens']
+        extra_tokens = num_tokens_extra(model)
 
         # used tokens
         used_tokens = prompt_tokens + input_tokens
@@ -69,3 +271,82 @@ class UI:
                                                               total_tokens,
                                                               str(int(max_total_tokens)), threshold)
         self.window.data['input.counter'].setText(string)
+
+
+class CounterSignals(QObject):
+    finished = Signal(int, object)
+
+
+class CounterWorker(QRunnable):
+    def __init__(self, id, texts, blocks, user_name, model, estimate=False):
+        """
+        Tokens counter worker
+
+        :param id: computation id
+        :param texts: prompts to count (dict)
+        :param blocks: input blocks to count: list of (block number, block text)
+        :param user_name: user name
+        :param model: model name
+        :param estimate: estimate tokens instead of encoding
+        """
+        super().__init__()
+        self.signals = CounterSignals()
+        self.id = id
+        self.texts = texts
+        self.blocks = blocks
+        self.user_name = user_name
+        self.model = model
+        self.estimate = estimate
+
+    @Slot()
+    def run(self):
+        """Counts tokens"""
+        tokens = {}
+        for key in self.texts:
+            tokens[key] = num_tokens_prompt(self.texts[key], self.user_name, self.model, self.estimate)
+        blocks = []
+        for number, text in self.blocks:
+            if self.estimate:
+                blocks.append((number, num_tokens_estimate(text, self.model)))
+            else:
+                blocks.append((number, num_tokens_from_string(text, self.model)))
+        self.signals.finished.emit(self.id, {
+            'texts': self.texts,
+            'tokens': tokens,
+            'blocks': blocks,
+            'user_name': self.user_name,
+            'model': self.model,
+            'estimate': self.estimate,
+        })
+
+
+class CalibrateSignals(QObject):
+    finished = Signal(str, object)
+
+
+class CalibrateWorker(QRunnable):
+    def __init__(self, name, model, names, context):
+        """
+        Tokens estimator calibration worker
+
+        :param name: encoding name
+        :param model: model name
+        :param names: contexts names (ids) to read samples from
+        :param context: context object
+        """
+        super().__init__()
+        self.signals = CalibrateSignals()
+        self.name = name
+        self.model = model
+        self.names = names
+        self.context = context
+
+    @Slot()
+    def run(self):
+        """Calibrates estimator"""
+        values = None
+        try:
+            values = self.context.calibrate_estimate(self.model, self.names)
+        except Exception as e:
+            print(e)
+        self.signals.finished.emit(self.name, values)
@@ -27,6 +27,14 @@ class ContextDebug:
         self.window.debugger.add(self.id, 'len(contexts)', str(len(self.window.gpt.context.contexts)))
         self.window.debugger.add(self.id, 'len(items)', str(len(self.window.gpt.context.items)))
 
+        cache = self.window.gpt.context.cache
+        self.window.debugger.add(self.id, 'cache.hits', str(cache.hits))
+        self.window.debugger.add(self.id, 'cache.misses', str(cache.misses))
+        self.window.debugger.add(self.id, 'cache.evictions', str(cache.evictions))
+        self.window.debugger.add(self.id, 'cache.contexts', str(len(cache.entries)))
+        self.window.debugger.add(self.id, 'cache.items', str(cache.items))
+        self.window.debugger.add(self.id, 'cache.size', str(cache.size))
+
         i = 0
         for item in self.window.gpt.context.items:
             prefix = '[{}] '.format(i)
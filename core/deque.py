@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+class ContextDeque:
+    COMPACT_MIN = 64  # min number of evicted slots before compacting
+
+    def __init__(self, items=None):
+        """
+        List with O(1) removal from both ends and O(1) indexing (usable with bisect)
+
+        Items removed from the front are skipped by head offset, space is reclaimed when
+        more than half of the list is unused (amortized O(1))
+
+        :param items: initial items
+        """
+        self.data = list(items) if items is not None else []
+        self.head = 0
+
+    def __len__(self):
+        return len(self.data) - self.head
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step > 0:
+                return self.data[self.head + start:self.head + stop:step]
+            return [self.data[self.head + i] for i in range(start, stop, step)]  # stop may be -1 here
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(idx)
+        return self.data[self.head + idx]
+
+    def __setitem__(self, idx, value):
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(idx)
+        self.data[self.head + idx] = value
+
+    def __iter__(self):
+        for idx in range(self.head, len(self.data)):
+            yield self.data[idx]
+
+    def append(self, item):
+        """
+        Appends item at the end
+
+        :param item: item
+        """
+        self.data.append(item)
+
+    def pop(self):
+        """
+        Removes last item
+
+        :return: removed item
+        """
+        if len(self) == 0:
+            raise IndexError("pop from empty deque")
+        return self.data.pop()
+
+    def popleft(self, num=1):
+        """
+        Removes items from the front
+
+        :param num: number of items to remove
+        :return: removed items list
+        """
+        num = min(num, len(self))
+        removed = self.data[self.head:self.head + num]
+        for idx in range(self.head, self.head + num):
+            self.data[idx] = None  # release references
+        self.head += num
+        if self.head >= self.COMPACT_MIN and self.head * 2 >= len(self.data):
+            del self.data[:self.head]
+            self.head = 0
+        return removed
+
+    def prepend(self, items):
+        """
+        Inserts items at the front (in order)
+
+        :param items: items
+        """
+        items = list(items)
+        if len(items) <= self.head:
+            self.head -= len(items)
+            self.data[self.head:self.head + len(items)] = items
+        else:
+            self.data[:self.head] = items
+            self.head = 0
+
+    def truncate(self, num):
+        """
+        Removes items from the end, keeps first items
+
+        :param num: number of items to keep
+        """
+        if num < len(self):
+            del self.data[self.head + max(num, 0):]
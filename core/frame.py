@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+import sys
+from array import array
+
+MISSING = -(2 ** 63)  # stored instead of None in integer columns
+INT_COLUMNS = ('id', 'input_timestamp', 'output_timestamp', 'input_tokens', 'output_tokens', 'total_tokens')
+NAME_COLUMNS = ('input_name', 'output_name')  # interned strings
+TEXT_COLUMNS = ('input', 'output')
+INT_DEFAULTS = {
+    'id': None,
+    'input_timestamp': None,
+    'output_timestamp': None,
+    'input_tokens': 0,
+    'output_tokens': 0,
+    'total_tokens': 0,
+}
+
+
+class ConversationFrame:
+    def __init__(self):
+        """
+        Columnar conversation store: parallel arrays instead of item objects
+
+        Integer fields are kept in typed arrays, modes as codes of modes table, names are interned.
+        Items are available as views (frame[i]) with the same attributes as ContextItem.
+        """
+        self.ints = {}
+        for name in INT_COLUMNS:
+            self.ints[name] = array('q')
+        self.names = {}
+        for name in NAME_COLUMNS:
+            self.names[name] = []
+        self.texts = {}
+        for name in TEXT_COLUMNS:
+            self.texts[name] = []
+        self.modes = []  # modes table
+        self.mode_codes = array('B')
+        self.tokens_cache = []  # tokens cache dict per item or None if empty
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        Creates frame from items data
+
+        :param data: context items data (list of dicts)
+        :return: frame
+        """
+        frame = cls()
+        for item in data:
+            frame.append(item)
+        return frame
+
+    def append(self, data):
+        """
+        Appends item
+
+        :param data: item data (dict)
+        """
+        for name in INT_COLUMNS:
+            value = data.get(name, INT_DEFAULTS[name])
+            if name == 'id' and value is None:
+                value = len(self) + 1  # items stored before ids were introduced
+            self.ints[name].append(MISSING if value is None else int(value))
+        for name in NAME_COLUMNS:
+            value = data.get(name)
+            self.names[name].append(sys.intern(value) if isinstance(value, str) else value)
+        for name in TEXT_COLUMNS:
+            self.texts[name].append(data.get(name))
+        self.mode_codes.append(self.get_mode_code(data.get('mode')))
+        cache = data.get('tokens_cache')
+        self.tokens_cache.append(cache if isinstance(cache, dict) and len(cache) > 0 else None)
+
+    def get_mode_code(self, mode):
+        """
+        Returns code of mode (adds mode to modes table if needed)
+
+        :param mode: mode
+        :return: mode code
+        """
+        if mode not in self.modes:
+            self.modes.append(mode)
+        return self.modes.index(mode)
+
+    def get(self, name, idx):
+        """
+        Returns item field value
+
+        :param name: field name
+        :param idx: item index
+        :return: value
+        """
+        if name in self.ints:
+            value = self.ints[name][idx]
+            return None if value == MISSING else value
+        elif name in self.names:
+            return self.names[name][idx]
+        elif name in self.texts:
+            return self.texts[name][idx]
+        elif name == 'mode':
+            return self.modes[self.mode_codes[idx]]
+        elif name == 'tokens_cache':
+            if self.tokens_cache[idx] is None:
+                self.tokens_cache[idx] = {}
+            return self.tokens_cache[idx]
+        raise AttributeError(name)
+
+    def set(self, name, idx, value):
+        """
+        Sets item field value
+
+        :param name: field name
+        :param idx: item index
+        :param value: value
+        """
+        if name in self.ints:
+            self.ints[name][idx] = MISSING if value is None else int(value)
+        elif name in self.names:
+            self.names[name][idx] = sys.intern(value) if isinstance(value, str) else value
+        elif name in self.texts:
+            self.texts[name][idx] = value
+        elif name == 'mode':
+            self.mode_codes[idx] = self.get_mode_code(value)
+        elif name == 'tokens_cache':
+            self.tokens_cache[idx] = value
+        else:
+            raise AttributeError(name)
+
+    def column(self, name):
+        """
+        Returns column (array for integer fields, list for other fields)
+
+        :param name: field name
+        :return: column
+        """
+        if name in self.ints:
+            return self.ints[name]
+        elif name in self.names:
+            return self.names[name]
+        elif name in self.texts:
+            return self.texts[name]
+        elif name == 'mode':
+            return [self.modes[code] for code in self.mode_codes]
+        raise AttributeError(name)
+
+    def sum(self, name):
+        """
+        Returns sum of integer column (missing values skipped)
+
+        :param name: field name
+        :return: sum
+        """
+        total = 0
+        for value in self.ints[name]:
+            if value != MISSING:
+                total += value
+        return total
+
+    def serialize(self, idx):
+        """
+        Serializes item to dict
+
+        :param idx: item index
+        :return: serialized item
+        """
+        data = {}
+        for name in FrameItem.FIELDS:
+            data[name] = self.get(name, idx)
+        data['tokens_cache'] = data['tokens_cache'].copy()
+        return data
+
+    def __len__(self):
+        return len(self.mode_codes)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(idx)
+        return FrameItem(self, idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield FrameItem(self, idx)
+
+
+class FrameField:
+    def __init__(self, name):
+        """
+        Frame item field (reads and writes frame column)
+
+        :param name: field name
+        """
+        self.name = name
+
+    def __get__(self, item, owner=None):
+        if item is None:
+            return self
+        return item.frame.get(self.name, item.idx)
+
+    def __set__(self, item, value):
+        item.frame.set(self.name, item.idx, value)
+
+
+class FrameItem:
+    __slots__ = ('frame', 'idx')
+    FIELDS = ('id', 'input', 'output', 'mode', 'input_name', 'output_name', 'input_tokens', 'output_tokens',
+              'total_tokens', 'input_timestamp', 'output_timestamp', 'tokens_cache')
+
+    id = FrameField('id')
+    input = FrameField('input')
+    output = FrameField('output')
+    mode = FrameField('mode')
+    input_name = FrameField('input_name')
+    output_name = FrameField('output_name')
+    input_tokens = FrameField('input_tokens')
+    output_tokens = FrameField('output_tokens')
+    total_tokens = FrameField('total_tokens')
+    input_timestamp = FrameField('input_timestamp')
+    output_timestamp = FrameField('output_timestamp')
+    tokens_cache = FrameField('tokens_cache')
+
+    def __init__(self, frame, idx):
+        """
+        Conversation frame item view (same attributes as ContextItem)
+
+        :param frame: conversation frame
+        :param idx: item index in frame
+        """
+        self.frame = frame
+        self.idx = idx
+
+    def set_tokens(self, input_tokens, output_tokens):
+        """
+        Sets tokens usage
+
+        :param input_tokens: prompt tokens
+        :param output_tokens: output tokens
+        """
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.total_tokens = input_tokens + output_tokens
+
+    def serialize(self):
+        """
+        Serializes item to dict
+
+        :return: serialized item
+        """
+        return self.frame.serialize(self.idx)
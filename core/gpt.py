@@ -9,11 +9,16 @@
 # Created Date: 2023.04.09 20:00:00                  #
 # ================================================== #
 
+import os
+import time
+
 import openai
 
-from core.tokens import num_tokens_prompt, num_tokens_extra
+from core.tokens import num_tokens_prompt, num_tokens_extra, num_tokens_estimate_error, set_bpe_path, \
+    num_tokens_from_string
 from core.context import Context, ContextItem
 from core.history import History
+from core.session import get_session
 
 
 class Gpt:
@@ -30,72 +35,124 @@ class Gpt:
         if not self.config.initialized:
             self.config.init()
 
+        # use installed BPE files for tokens counting
+        set_bpe_path(os.path.join(self.config.path, 'tiktoken'))
+
     def init(self):
-        """Initializes OpenAI API key"""
+        """Initializes OpenAI API key and shared HTTP session"""
         openai.api_key = self.config.data["api_key"]
+        openai.requestssession = get_session(self.config)
 
-    def completion(self, prompt, max_tokens):
+    def prepare(self, prompt, mode, stream=False):
         """
-        Calls OpenAI API for completion
+        Prepares API request (builds prompt with context and counts tokens, call on GUI thread)
+
+        Request is sent later with request() or request_stream(), which use only prepared data
 
         :param prompt: Prompt (user message)
-        :param max_tokens: Max output tokens
-        :return: Response dict
-        """
-        # build prompt message
-        message = self.build_completion(prompt)
-
-        # prepare stop word if user_name is set
-        stop = None
-        if self.config.data['user_name'] is not None and self.config.data['user_name'] != '':
-            stop = [self.config.data['user_name'] + ':']
-
-        response = openai.Completion.create(
-            prompt=message,
-            model=self.config.data['model'],
-            max_tokens=int(max_tokens),
-            temperature=self.config.data['temperature'],
-            top_p=self.config.data['top_p'],
-            frequency_penalty=self.config.data['frequency_penalty'],
-            presence_penalty=self.config.data['presence_penalty'],
-            stop=stop,
-        )
-        return response
-
-    def chat(self, prompt, max_tokens):
+        :param mode: Mode (completion or chat)
+        :param stream: Stream response
+        :return: Request dict or None if mode is not supported
+        """
+        if mode != "completion" and mode != "chat":
+            return None
+
+        # store history
+        if self.config.data['store_history']:
+            self.history.save(prompt)
+
+        items, ctx_tokens = self.get_context_items(prompt)
+        params = {
+            'model': self.config.data['model'],
+            'max_tokens': int(self.get_max_tokens()),
+            'temperature': self.config.data['temperature'],
+            'top_p': self.config.data['top_p'],
+            'frequency_penalty': self.config.data['frequency_penalty'],
+            'presence_penalty': self.config.data['presence_penalty'],
+            'stop': None,
+            'stream': stream,
+            'request_timeout': self.config.get_timeout(),
+        }
+        if mode == "completion":
+            params['prompt'] = self.build_completion(prompt, items)
+
+            # prepare stop word if user_name is set
+            if self.config.data['user_name'] is not None and self.config.data['user_name'] != '':
+                params['stop'] = [self.config.data['user_name'] + ':']
+        else:
+            params['messages'] = self.build_chat_messages(prompt, items)
+
+        input_tokens = None
+        if stream:
+            input_tokens = self.count_input_tokens(prompt, ctx_tokens)  # usage is not returned in stream
+        return {
+            'mode': mode,
+            'params': params,
+            'input_tokens': input_tokens,
+        }
+
+    def completion(self, params):
+        """
+        Calls OpenAI API for completion
+
+        :param params: Prepared request params
+        :return: Response dict (or chunks generator if stream)
+        """
+        return openai.Completion.create(**params)
+
+    def chat(self, params):
         """
         Call OpenAI API for chat
 
-        :param prompt: Prompt (user message)
-        :param max_tokens: Max output tokens
-        :return: Response dict
-        """
-        # build chat messages
-        messages = self.build_chat_messages(prompt)
-        response = openai.ChatCompletion.create(
-            messages=messages,
-            model=self.config.data['model'],
-            max_tokens=int(max_tokens),
-            temperature=self.config.data['temperature'],
-            top_p=self.config.data['top_p'],
-            frequency_penalty=self.config.data['frequency_penalty'],
-            presence_penalty=self.config.data['presence_penalty'],
-            stop=None,
-        )
-        return response
-
-    def build_chat_messages(self, prompt):
+        :param params: Prepared request params
+        :return: Response dict (or chunks generator if stream)
         """
-        Builds chat messages dict
+        return openai.ChatCompletion.create(**params)
 
-        :param prompt: Prompt
-        :return: Messages dict
+    def send(self, request):
         """
-        messages = []
+        Sends prepared request
 
+        :param request: Request dict
+        :return: Response dict (or chunks generator if stream)
+        """
+        if request['mode'] == "completion":
+            return self.completion(request['params'])
+        return self.chat(request['params'])
+
+    def get_context_items(self, prompt):
+        """
+        Returns context items to add to prompt
+
+        :param prompt: Prompt (current)
+        :return: Context items list, context items tokens count
+        """
+        if not self.config.data['use_context']:
+            return [], 0
         model = self.config.data['model']
         used_tokens = self.count_used_tokens(prompt)
         max_tokens = self.config.data['max_total_tokens']
+        return self.context.get_prompt_plan(model, used_tokens, max_tokens)
+
+    def count_input_tokens(self, prompt, ctx_tokens):
+        """
+        Counts prompt tokens as sent (context items are counted from cached per-item counts)
+
+        :param prompt: Prompt (current)
+        :param ctx_tokens: Context items tokens count
+        :return: Prompt tokens
+        """
+        return self.count_used_tokens_mode(prompt) - self.config.data['context_threshold'] + ctx_tokens
+
+    def build_chat_messages(self, prompt, items):
+        """
+        Builds chat messages dict
+
+        :param prompt: Prompt
+        :param items: Context items to add
+        :return: Messages dict
+        """
+        messages = []
 
         # append initial (system) message
         if self.config.data['prompt'] is not None and self.config.data['prompt'] != "":
@@ -103,7 +160,6 @@ class Gpt:
 
         # append messages from context (memory)
         if self.config.data['use_context']:
-            items = self.context.get_prompt_items(model, used_tokens, max_tokens)
             for item in items:
                 # input
                 if item.input_name is not None and item.input_name != "":
@@ -128,23 +184,20 @@ class Gpt:
 
         return messages
 
-    def build_completion(self, prompt):
+    def build_completion(self, prompt, items):
         """
         Builds completion string
 
         :param prompt: Prompt (current)
+        :param items: Context items to add
         :return: Message string (parsed with context)
         """
         message = ""
-        model = self.config.data['model']
-        used_tokens = self.count_used_tokens(prompt)
-        max_tokens = self.config.data['max_total_tokens']
 
         if self.config.data['prompt'] is not None and self.config.data['prompt'] != "":
             message += self.config.data['prompt']
 
         if self.config.data['use_context']:
-            items = self.context.get_prompt_items(model, used_tokens, max_tokens)
             for item in items:
                 if item.input_name is not None \
                         and item.output_name is not None \
@@ -171,27 +224,47 @@ class Gpt:
         """
         Counts used tokens
 
+        If estimator is enabled, exact count is used only when close to max total tokens
+
+        :param input_text: Input text
+        :return: Used tokens
+        """
+        if self.config.data['tokens_estimate']:
+            model = self.config.data['model']
+            tokens = self.count_used_tokens_mode(input_text, True)
+            error = num_tokens_estimate_error(tokens, model)
+            ctx_tokens = 0
+            if self.config.data['use_context']:
+                ctx_tokens = self.context.count_tokens(model)
+
+            # whole context fits even in the worst case, so the exact count would not change anything
+            if tokens + error + ctx_tokens <= self.config.data['max_total_tokens']:
+                return tokens
+        return self.count_used_tokens_mode(input_text, False)
+
+    def count_used_tokens_mode(self, input_text, estimate=False):
+        """
+        Counts used tokens (exact or estimated)
+
         :param input_text: Input text
+        :param estimate: Estimate instead of exact count
         :return: Used tokens
         """
         model = self.config.data['model']
         tokens = 0
         tokens += num_tokens_prompt(self.config.data['prompt'], self.config.data['user_name'],
-                                    model)  # init (system) prompt
-        tokens += num_tokens_prompt(input_text, self.config.data['user_name'], model)  # current input
+                                    model, estimate)  # init (system) prompt
+        tokens += num_tokens_prompt(input_text, self.config.data['user_name'], model, estimate)  # current input
         tokens += self.config.data['context_threshold']  # context threshold (reserved for next output)
         tokens += num_tokens_extra(model)  # extra tokens (required for output)
         return tokens
 
-    def call(self, prompt, ctx=None):
+    def get_max_tokens(self):
         """
-        Calls OpenAI API
+        Returns max output tokens
 
-        :param prompt: User input (prompt)
-        :param ctx: Context item (memory)
-        :return: Context item (memory)
+        :return: Max output tokens
         """
-        # prepare max tokens
         model_tokens = self.config.get_model_tokens(self.config.data['model'])
         max_tokens = self.config.data['max_output_tokens']
         if max_tokens > model_tokens:
@@ -200,20 +273,16 @@ class Gpt:
         # minimum 1 token is required
         if max_tokens < 1:
             max_tokens = 1
+        return max_tokens
 
-        # store history
-        if self.config.data['store_history']:
-            self.history.save(prompt)
-
-        # get response
-        response = None
-        if self.config.data['mode'] == "completion":
-            response = self.completion(prompt, max_tokens)
-        elif self.config.data['mode'] == "chat":
-            response = self.chat(prompt, max_tokens)
+    def request(self, request):
+        """
+        Sends prepared request and reads response (network only, can be called on worker thread)
 
-        if response is None:
-            return None
+        :param request: Request dict
+        :return: Result dict or None if error
+        """
+        response = self.send(request)
 
         # check for errors
         if "error" in response:
@@ -221,26 +290,116 @@ class Gpt:
             return None
 
         # get output
-        output = ""
-        if self.config.data['mode'] == "completion":
+        if request['mode'] == "completion":
             output = response["choices"][0]["text"].strip()
-        elif self.config.data['mode'] == "chat":
+        else:
             output = response["choices"][0]["message"]["content"].strip()
 
-        # store context (memory)
+        return {
+            'output': output,
+            'input_tokens': response["usage"]["prompt_tokens"],
+            'output_tokens': response["usage"]["completion_tokens"],
+            'ttft': None,
+        }
+
+    def request_stream(self, request):
+        """
+        Sends prepared request in stream mode, yields output text as it arrives
+        (network only, can be called on worker thread)
+
+        :param request: Request dict
+        :return: Output text chunks generator (returns result dict when finished)
+        """
+        start = time.perf_counter()
+        ttft = None  # time to first token (seconds)
+        response = self.send(request)
+
+        # get output
+        chunks = []
+        try:
+            for chunk in response:
+                if "error" in chunk:
+                    print("Error: " + str(chunk["error"]))
+                    break
+                if len(chunk["choices"]) == 0:
+                    continue
+                if request['mode'] == "completion":
+                    text = chunk["choices"][0].get("text")
+                else:
+                    text = chunk["choices"][0]["delta"].get("content")
+                if not text:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                if len(chunks) == 0:
+                    text = text.lstrip()  # output is stripped, as in non-stream mode
+                    if text == "":
+                        continue
+                chunks.append(text)
+                yield text
+        finally:
+            if hasattr(response, 'close'):
+                response.close()  # stream closed before end (cancelled)
+
+        return {
+            'output': "".join(chunks).rstrip(),
+            'input_tokens': request['input_tokens'],
+            'output_tokens': None,  # counted on finish
+            'ttft': ttft,
+        }
+
+    def finish_partial(self, prompt, ctx, request, output):
+        """
+        Stores partial output of cancelled stream in context (memory)
+
+        :param prompt: User input (prompt)
+        :param ctx: Context item (memory)
+        :param request: Request dict
+        :param output: Output text received before cancel
+        :return: Context item (memory)
+        """
+        result = {
+            'output': output.strip(),
+            'input_tokens': request['input_tokens'],
+            'output_tokens': None,
+            'ttft': None,
+        }
+        return self.finish(prompt, ctx, result)
+
+    def finish(self, prompt, ctx, result, store=True):
+        """
+        Sets response in context item (call on GUI thread)
+
+        :param prompt: User input (prompt)
+        :param ctx: Context item (memory)
+        :param result: Result dict
+        :param store: Add context item to context (memory)
+        :return: Context item (memory)
+        """
         if ctx is None:
             ctx = ContextItem(self.config.data['mode'])
             ctx.set_input(prompt, self.config.data['user_name'])
 
-        ctx.set_output(output, self.config.data['ai_name'])
-        ctx.set_tokens(response["usage"]["prompt_tokens"], response["usage"]["completion_tokens"])
+        output_tokens = result['output_tokens']
+        if output_tokens is None:
+            output_tokens = num_tokens_from_string(result['output'], self.config.data['model'])
+        ctx.set_output(result['output'], self.config.data['ai_name'])
+        ctx.set_tokens(result['input_tokens'], output_tokens)
+        if store:
+            self.store(ctx)
+        return ctx
+
+    def store(self, ctx):
+        """
+        Stores context item in context (memory) and output in history
+
+        :param ctx: Context item (memory)
+        """
         self.context.add(ctx)
 
         # store history
         if self.config.data['store_history']:
-            self.history.save(output)
-
-        return ctx
+            self.history.save(ctx.output)
 
     def clear(self):
         """Clears context (memory)"""
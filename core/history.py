@@ -44,11 +44,9 @@ class History:
         if os.path.exists(self.path):
             f = os.path.join(self.path, name)
             try:
-                with open(f, 'a', encoding="utf-8") as file:
-                    prefix = ""
-                    if self.config.data['store_history_time']:
-                        prefix = datetime.datetime.now().strftime("%H:%M:%S") + ": "
-                    file.write(prefix + text + "\n")
-                    file.close()
+                prefix = ""
+                if self.config.data['store_history_time']:
+                    prefix = datetime.datetime.now().strftime("%H:%M:%S") + ": "
+                self.config.writer.append(f, prefix + text + "\n")
             except Exception as e:
                 print("Error saving history: " + str(e))
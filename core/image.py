@@ -11,9 +11,10 @@
 
 import datetime
 import os
-import requests
 import openai
 
+from core.session import get_session
+
 
 class Image:
     DIRNAME = "img"
@@ -29,8 +30,9 @@ class Image:
             self.config.init()
 
     def init(self):
-        """Initialize OpenAI API key"""
+        """Initialize OpenAI API key and shared HTTP session"""
         openai.api_key = self.config.data["api_key"]
+        openai.requestssession = get_session(self.config)
 
     def generate(self, prompt, num=None):
         """
@@ -53,7 +55,7 @@ class Image:
         paths = []
         for i in range(num):
             url = response['data'][i]['url']
-            res = requests.get(url)
+            res = get_session(self.config).get(url, timeout=self.config.get_timeout())
             name = self.make_safe_filename(prompt) + "-" + datetime.date.today().strftime(
                 "%Y-%m-%d") + "_" + datetime.datetime.now().strftime("%H-%M-%S") + "-" + str(i + 1) + ".png"
             path = os.path.join(self.config.path, self.DIRNAME, name)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+session = None  # shared HTTP session, created by get_session
+session_lock = threading.Lock()
+last_used = 0  # monotonic time of last request sent with shared session
+local = threading.local()  # request handle of current thread, see set_handle
+
+
+class RequestHandle:
+    def __init__(self):
+        """
+        Handle of request sent on worker thread, used to abort it from other thread
+
+        Connections used by requests of thread with this handle set are attached to it
+        and detached when returned to pool
+        """
+        self.lock = threading.Lock()
+        self.conns = []
+        self.cancelled = False
+
+    def attach(self, conn):
+        """
+        Attaches connection used by request
+
+        :param conn: urllib3 connection
+        """
+        with self.lock:
+            if self.cancelled:
+                raise requests.exceptions.ConnectionError("Request cancelled")
+            self.conns.append(conn)
+
+    def detach(self, conn):
+        """
+        Detaches connection (request finished with it)
+
+        :param conn: urllib3 connection
+        """
+        with self.lock:
+            if conn in self.conns:
+                self.conns.remove(conn)
+
+    def cancel(self):
+        """Aborts request, blocked reads on its connections fail immediately"""
+        with self.lock:
+            self.cancelled = True
+            for conn in self.conns:
+                sock = conn.sock
+                if sock is None:
+                    continue
+                try:
+                    socket.socket.shutdown(sock, socket.SHUT_RDWR)  # raw socket, also for TLS connections
+                except OSError:
+                    pass
+            self.conns = []
+
+
+def set_handle(handle):
+    """
+    Sets request handle of current thread
+
+    :param handle: request handle or None
+    """
+    local.handle = handle
+
+
+class CancellableMixin:
+    def _make_request(self, conn, *args, **kwargs):
+        """Attaches connection to request handle of current thread and sends request on it"""
+        handle = getattr(local, 'handle', None)
+        if handle is not None:
+            handle.attach(conn)
+        return super()._make_request(conn, *args, **kwargs)
+
+    def _put_conn(self, conn):
+        """Detaches connection from request handle of current thread and returns it to pool"""
+        handle = getattr(local, 'handle', None)
+        if handle is not None and conn is not None:
+            handle.detach(conn)
+        super()._put_conn(conn)
+
+
+class CancellableHTTPConnectionPool(CancellableMixin, HTTPConnectionPool):
+    pass
+
+
+class CancellableHTTPSConnectionPool(CancellableMixin, HTTPSConnectionPool):
+    pass
+
+
+class PoolAdapter(HTTPAdapter):
+    def __init__(self, pool_size, timeout):
+        """
+        HTTP adapter with keep-alive connections pool and default timeout
+
+        :param pool_size: max number of kept connections per host
+        :param timeout: (connect, read) timeout used if request has no timeout
+        """
+        self.timeout = timeout
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Creates pool manager with connections pools that can be aborted by request handle"""
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CancellableHTTPConnectionPool,
+            'https': CancellableHTTPSConnectionPool,
+        }
+
+    def send(self, request, timeout=None, **kwargs):
+        """
+        Sends request (on pooled connection)
+
+        :param request: prepared request
+        :param timeout: request timeout (None = default, single value = connect and read timeout)
+        :return: response
+        """
+        if timeout is None:
+            timeout = self.timeout
+        elif not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        touch()
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+class Session(requests.Session):
+    def close(self):
+        """Keeps pooled connections (session is shared by all threads and clients), see shutdown()"""
+        pass
+
+    def shutdown(self):
+        """Closes pooled connections"""
+        super().close()
+
+
+def get_session(config):
+    """
+    Returns shared HTTP session (created on first call)
+
+    Connections are kept alive and reused by all requests (OpenAI API, images downloads, updates),
+    so repeated requests to the same host skip TCP and TLS handshakes
+
+    :param config: config object
+    :return: requests session
+    """
+    global session
+    if session is not None:
+        return session
+    with session_lock:
+        if session is None:
+            adapter = PoolAdapter(config.data['http_pool_size'], config.get_timeout())
+            new_session = Session()
+            new_session.mount('https://', adapter)
+            new_session.mount('http://', adapter)
+            session = new_session
+    return session
+
+
+def touch():
+    """Marks shared session as used now"""
+    global last_used
+    last_used = time.monotonic()
+
+
+def is_idle(seconds):
+    """
+    Checks if shared session was not used for given time
+
+    :param seconds: idle time in seconds
+    :return: True if idle
+    """
+    return time.monotonic() - last_used >= seconds
+
+
+def prewarm(config, url):
+    """
+    Opens (or refreshes) pooled keep-alive connection to host of URL, next request to host is sent on it
+
+    :param config: config object
+    :param url: URL of host (response is ignored)
+    """
+    get_session(config).head(url, timeout=config.get_timeout(), allow_redirects=False)
+
+
+def close_session():
+    """Closes shared HTTP session"""
+    global session
+    with session_lock:
+        if session is not None:
+            session.shutdown()
+            session = None
@@ -11,6 +11,8 @@
 
 import os
 
+from core.writer import write_file
+
 
 class Settings:
     def __init__(self, window=None):
@@ -46,9 +48,8 @@ class Settings:
         file = self.window.dialog['config.editor'].file
         path = os.path.join(self.window.config.path, file)
         try:
-            with open(path, 'w') as f:
-                f.write(self.window.editor['config'].toPlainText())
-                f.close()
+            self.window.config.writer.discard(path)  # edited content replaces pending writes
+            write_file(path, self.window.editor['config'].toPlainText())
             self.window.set_status("Saved file: {}".format(path))
             self.window.ui.dialogs.alert("Saved file: {}".format(path))
         except Exception as e:
@@ -63,6 +64,7 @@ class Settings:
         """
         # load file
         path = os.path.join(self.window.config.path, file)
+        self.window.config.writer.flush(path)
         self.window.path_label['config'].setText(path)
         self.window.dialog['config.editor'].file = file
         try:
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+class BaseStorage:
+    PARTIAL = False  # writes touch only changed items, so context may be loaded partially
+
+    def __init__(self, config=None):
+        """
+        Context storage base
+
+        Write methods receive the full items list and the changed item, so every storage
+        can persist only what it needs (e.g. a single row) or rewrite the whole context
+
+        :param config: config object
+        """
+        self.config = config
+
+    def install(self):
+        """
+        Prepares storage (directories, schema)
+
+        :return: True if storage was created now (is empty)
+        """
+        return False
+
+    def close(self):
+        """Closes storage (finishes pending work)"""
+        pass
+
+    def recover(self):
+        """Repairs storage after interrupted writes"""
+        pass
+
+    def load_list(self):
+        """
+        Loads contexts index
+
+        :return: contexts dict: id -> meta dict
+        """
+        return {}
+
+    def save_meta(self, name, meta):
+        """
+        Saves single context entry in index
+
+        :param name: context name (id)
+        :param meta: context meta dict
+        """
+        pass
+
+    def load(self, name):
+        """
+        Loads context items
+
+        :param name: context name (id)
+        :return: context items data (list of dicts)
+        """
+        return []
+
+    def get_version(self, name):
+        """
+        Returns stored context version (changes when context is modified in storage)
+
+        :param name: context name (id)
+        :return: version or None if not supported
+        """
+        return None
+
+    def load_tail(self, name, limit, before=None):
+        """
+        Loads last context items (older than given item)
+
+        :param name: context name (id)
+        :param limit: max number of items
+        :param before: load only items with id lower than this id (None = newest)
+        :return: context items data (list of dicts, ascending)
+        """
+        items = []
+        for data in self.load(name):
+            if data.get('id') is None:
+                data['id'] = len(items) + 1  # items stored before ids were introduced
+            items.append(data)
+        if before is not None:
+            items = [data for data in items if data['id'] < before]
+        return items[-limit:]
+
+    def save(self, name, items):
+        """
+        Saves all context items
+
+        :param name: context name (id)
+        :param items: context items
+        """
+        pass
+
+    def append(self, name, items, item):
+        """
+        Saves item appended at the end of context
+
+        :param name: context name (id)
+        :param items: context items
+        :param item: appended item
+        """
+        self.save(name, items)
+
+    def update(self, name, items, item):
+        """
+        Saves updated item
+
+        :param name: context name (id)
+        :param items: context items
+        :param item: updated item
+        """
+        self.save(name, items)
+
+    def remove(self, name, items, item):
+        """
+        Removes item from context
+
+        :param name: context name (id)
+        :param items: context items (already without removed item)
+        :param item: removed item
+        """
+        self.save(name, items)
+
+    def remove_before(self, name, id):
+        """
+        Removes all items older than given item (without loading them)
+
+        Used for not loaded items of partially loaded context, so only partial storages implement it
+
+        :param name: context name (id)
+        :param id: id of first kept item
+        """
+        pass
+
+    def compress(self, name, method, days):
+        """
+        Compresses context if not modified for given number of days
+
+        :param name: context name (id)
+        :param method: compression method
+        :param days: min number of days since last modification
+        :return: True if compressed
+        """
+        return False
+
+    def delete(self, name):
+        """
+        Deletes context and its index entry
+
+        :param name: context name (id)
+        """
+        pass
+
+    def delete_all(self):
+        """Deletes all contexts"""
+        pass
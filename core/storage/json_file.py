@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+import os
+import threading
+import time
+
+from core.codec import dumpb, load, loads
+from core.compress import detect, compress_stream
+from core.storage.base import BaseStorage
+from core.writer import write_file, recover, policy, FSYNC_NONE
+
+
+class JsonStorage(BaseStorage):
+    DIRNAME = "context"
+    INDEX = "context.json"
+    INDEX_LOG = "context.log"
+    INDEX_LOG_MAX = 200  # max records in index log before compacting it into index
+
+    def __init__(self, config=None):
+        """
+        JSON files context storage: context.json index and context/{id}.json per context
+
+        Index changes are appended to context.log and periodically compacted into context.json
+
+        :param config: config object
+        """
+        super(JsonStorage, self).__init__(config)
+        self.contexts = {}
+        self.index_log_records = 0
+        self.lock = threading.RLock()  # storage changes vs. compression of files
+
+    def get_path(self, name):
+        """
+        Returns context file path
+
+        :param name: context name (id)
+        :return: file path
+        """
+        return os.path.join(self.config.path, self.DIRNAME, name + '.json')
+
+    def install(self):
+        """
+        Prepares storage directory
+
+        :return: True if storage was created now
+        """
+        path = os.path.join(self.config.path, self.DIRNAME)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        return not os.path.exists(os.path.join(self.config.path, self.INDEX)) \
+            and not os.path.exists(os.path.join(self.config.path, self.INDEX_LOG))
+
+    def recover(self):
+        """Repairs context files after interrupted writes (index in config directory is repaired by config)"""
+        recover(os.path.join(self.config.path, self.DIRNAME))
+
+    def close(self):
+        """Compacts index log"""
+        if self.index_log_records > 0:
+            self.dump_list()
+
+    def load_list(self):
+        """
+        Loads contexts index (and replays index log)
+
+        :return: contexts dict
+        """
+        path = os.path.join(self.config.path, self.INDEX)
+        log_path = os.path.join(self.config.path, self.INDEX_LOG)
+        self.config.writer.flush(log_path)
+        self.contexts = {}
+        try:
+            if os.path.exists(path):
+                self.contexts = load(path)['items']
+        except Exception as e:
+            print(e)
+            self.contexts = {}
+
+        self.index_log_records = 0
+        try:
+            if os.path.exists(log_path):
+                with open(log_path, "rb") as file:
+                    for line in file:
+                        try:
+                            record = loads(line)
+                        except ValueError:
+                            continue  # partially written last line
+                        self.index_log_records += 1
+                        if record['op'] == 'put':
+                            self.contexts[record['id']] = record['meta']
+                        elif record['op'] == 'del' and record['id'] in self.contexts:
+                            del self.contexts[record['id']]
+        except Exception as e:
+            print(e)
+
+        contexts = {}
+        for name in self.contexts:
+            contexts[name] = self.contexts[name].copy()
+        return contexts
+
+    def save_meta(self, name, meta):
+        """
+        Saves single context entry in index
+
+        :param name: context name (id)
+        :param meta: context meta dict
+        """
+        if name in self.contexts and self.contexts[name] == meta:
+            return  # not changed
+        self.contexts[name] = meta.copy()
+        self.append_list({'op': 'put', 'id': name, 'meta': meta})
+
+    def append_list(self, record):
+        """
+        Appends record to index log, compacts log into index if too long
+
+        :param record: index log record
+        """
+        if self.index_log_records >= self.INDEX_LOG_MAX:
+            self.dump_list()
+            return
+        try:
+            log_path = os.path.join(self.config.path, self.INDEX_LOG)
+            self.config.writer.append(log_path, dumpb(record) + b"\n")
+            self.index_log_records += 1
+        except Exception as e:
+            print(e)
+            self.dump_list()
+
+    def dump_list(self):
+        """Dumps whole contexts index to file and clears index log"""
+        index_path = os.path.join(self.config.path, self.INDEX)
+        log_path = os.path.join(self.config.path, self.INDEX_LOG)
+        data = {}
+        data['items'] = self.contexts.copy()
+        data['__meta__'] = self.config.append_meta()
+        try:
+            self.config.writer.discard(log_path)  # already included in index
+            write_file(index_path, dumpb(data))
+            if os.path.exists(log_path):
+                os.remove(log_path)
+            self.index_log_records = 0
+        except Exception as e:
+            print(e)
+
+    def get_file_version(self, path):
+        """
+        Returns file version (writes pending changes first)
+
+        :param path: file path
+        :return: (mtime, size) tuple or 0 if file not exists
+        """
+        self.config.writer.flush(path)
+        if not os.path.exists(path):
+            return 0
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_version(self, name):
+        """
+        Returns stored context version (context file mtime and size)
+
+        :param name: context name (id)
+        :return: version
+        """
+        return self.get_file_version(self.get_path(name))
+
+    def load(self, name):
+        """
+        Loads context items
+
+        :param name: context name (id)
+        :return: context items data
+        """
+        path = self.get_path(name)
+        self.config.writer.flush(path)
+        if os.path.exists(path):
+            return load(path)
+        return []
+
+    def save(self, name, items):
+        """
+        Saves all context items
+
+        :param name: context name (id)
+        :param items: context items
+        """
+        try:
+            data = []
+            for item in items:
+                data.append(item.serialize())
+            with self.lock:
+                self.config.writer.write(self.get_path(name), lambda: dumpb(data))
+        except Exception as e:
+            print(e)
+
+    def compress(self, name, method, days):
+        """
+        Compresses context file if not modified for given number of days
+
+        :param name: context name (id)
+        :param method: compression method
+        :param days: min number of days since last modification
+        :return: True if compressed
+        """
+        return self.compress_file(self.get_path(name), method, days)
+
+    def compress_file(self, path, method, days):
+        """
+        Compresses file in place (atomically, keeps modification time), skips recently modified files
+
+        :param path: file path
+        :param method: compression method
+        :param days: min number of days since last modification
+        :return: True if compressed
+        """
+        if not os.path.exists(path) or self.config.writer.is_pending(path):
+            return False
+        stat = os.stat(path)
+        if time.time() - stat.st_mtime < days * 86400 or detect(path) is not None:
+            return False
+
+        tmp_path = path + '.ztmp'
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            compress_stream(src, dst, method)
+            if policy['fsync'] != FSYNC_NONE:
+                dst.flush()
+                os.fsync(dst.fileno())
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        # file modified or deleted meanwhile (checked and replaced under lock, so no write is queued in between)
+        with self.lock:
+            self.config.writer.flush(path)
+            try:
+                current = os.stat(path)
+            except OSError:
+                current = None
+            if current is None or current.st_mtime_ns != stat.st_mtime_ns or current.st_size != stat.st_size:
+                os.remove(tmp_path)
+                return False
+            os.replace(tmp_path, path)
+        return True
+
+    def delete(self, name):
+        """
+        Deletes context file and its index entry
+
+        :param name: context name (id)
+        """
+        path = self.get_path(name)
+        with self.lock:
+            self.config.writer.discard(path)
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except Exception as e:
+                    print(e)
+        if name in self.contexts:
+            del self.contexts[name]
+            self.append_list({'op': 'del', 'id': name})
+
+    def delete_all(self):
+        """Deletes all context files"""
+        with self.lock:
+            for name in self.contexts:
+                path = self.get_path(name)
+                self.config.writer.discard(path)
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except Exception as e:
+                        print(e)
+        self.contexts = {}
+        self.dump_list()
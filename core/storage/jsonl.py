@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+import os
+import threading
+
+from core.codec import dumpb, loads
+from core.compress import detect, open_file
+from core.storage.json_file import JsonStorage
+from core.writer import write_file
+
+
+class JsonlStorage(JsonStorage):
+    COMPACT_INTERVAL = 60  # seconds between compactor runs
+    COMPACT_MIN = 20  # min number of obsolete records to compact file
+    COMPACT_RATIO = 0.5  # min ratio of obsolete records to compact file
+    CHUNK_SIZE = 65536  # bytes read at once when scanning journal from the end
+    PARTIAL = True
+
+    def __init__(self, config=None):
+        """
+        Append-only JSONL journal context storage: context/{id}.jsonl per context
+
+        Every record is one line: {"op": "put", "item": {...}} adds item (or replaces item by id),
+        {"op": "set", "item": {...}} replaces item by id in place, {"op": "del", "id": ...} is a tombstone,
+        {"op": "cut", "before": ...} removes all items with lower ids.
+        Put records are appended in ids order. Files are compacted in background.
+
+        :param config: config object
+        """
+        super(JsonlStorage, self).__init__(config)
+        self.stats = {}  # context name -> [records, live items]
+        self.unknown = set()  # names of journals appended without stats (not replayed, e.g. loaded lazily)
+        self.cursors = {}  # context name -> reverse scan state to continue loading older items
+        self.compactor = None
+        self.stopped = threading.Event()
+
+    def get_journal_path(self, name):
+        """
+        Returns context journal file path
+
+        :param name: context name (id)
+        :return: file path
+        """
+        return os.path.join(self.config.path, self.DIRNAME, name + '.jsonl')
+
+    def install(self):
+        """
+        Prepares storage directory and starts compactor
+
+        :return: always False, index is shared with JSON storage and JSON files are read directly
+        """
+        super(JsonlStorage, self).install()
+        if self.compactor is None:
+            self.compactor = threading.Thread(target=self.run_compactor, daemon=True)
+            self.compactor.start()
+        return False
+
+    def close(self):
+        """Stops compactor and compacts remaining files"""
+        self.stopped.set()
+        self.compact_all()
+        super(JsonlStorage, self).close()
+
+    def run_compactor(self):
+        """Compactor thread loop"""
+        while not self.stopped.wait(self.COMPACT_INTERVAL):
+            self.compact_all()
+
+    def compact_all(self):
+        """Compacts all journals with too many obsolete records (journals without stats are replayed first)"""
+        with self.lock:
+            names = list(self.stats.keys()) + list(self.unknown)
+        for name in names:
+            with self.lock:
+                if name in self.unknown:
+                    self.unknown.discard(name)
+                    if name not in self.stats and os.path.exists(self.get_journal_path(name)):
+                        try:
+                            self.replay(name)
+                        except Exception as e:
+                            print("Error reading context {}: {}".format(name, e))
+                if name not in self.stats:
+                    continue
+                records, live = self.stats[name]
+                garbage = records - live
+                if garbage < self.COMPACT_MIN or garbage < records * self.COMPACT_RATIO:
+                    continue
+                try:
+                    self.write_journal(name, self.replay(name))
+                except Exception as e:
+                    print("Error compacting context {}: {}".format(name, e))
+
+    def replay(self, name):
+        """
+        Replays journal
+
+        :param name: context name (id)
+        :return: items data dict: id -> item data (in order)
+        """
+        items = {}
+        records = 0
+        path = self.get_journal_path(name)
+        self.config.writer.flush(path)
+        with open_file(path) as f:
+            for line in f:
+                if line.strip() == b"":
+                    continue
+                try:
+                    record = loads(line)
+                except ValueError:
+                    continue  # partially written last line
+                records += 1
+                if record['op'] == 'put' or record['op'] == 'set':
+                    items[record['item']['id']] = record['item']
+                elif record['op'] == 'del' and record['id'] in items:
+                    del items[record['id']]
+                elif record['op'] == 'cut':
+                    items = {id: data for id, data in items.items() if id >= record['before']}
+        self.stats[name] = [records, len(items)]
+        return items
+
+    def write_journal(self, name, items):
+        """
+        Rewrites journal with put records of items only
+
+        :param name: context name (id)
+        :param items: items data dict: id -> item data
+        """
+        path = self.get_journal_path(name)
+        lines = []
+        for id in items:
+            lines.append(dumpb({'op': 'put', 'item': items[id]}) + b"\n")
+        self.config.writer.discard(path)  # pending records are already replayed into items
+        write_file(path, b"".join(lines))
+        self.stats[name] = [len(items), len(items)]
+        if name in self.cursors:
+            del self.cursors[name]  # offsets changed
+
+    def write_records(self, name, records, live):
+        """
+        Appends records to journal
+
+        :param name: context name (id)
+        :param records: records list
+        :param live: change of live items count
+        """
+        path = self.get_journal_path(name)
+        if os.path.exists(path) and detect(path) is not None:
+            self.write_journal(name, self.replay(name))  # decompress before append
+        elif not os.path.exists(path):
+            # convert context stored in JSON file before first append
+            items = {}
+            for data in super(JsonlStorage, self).load(name):
+                if 'id' in data and data['id'] is not None:
+                    items[data['id']] = data
+                else:
+                    data['id'] = len(items) + 1
+                    items[data['id']] = data
+            self.write_journal(name, items)
+            legacy = self.get_path(name)
+            if os.path.exists(legacy):
+                os.remove(legacy)
+
+        lines = []
+        for record in records:
+            lines.append(dumpb(record) + b"\n")
+        self.config.writer.append(path, b"".join(lines))
+        if name in self.stats:
+            self.stats[name][0] += len(records)
+            self.stats[name][1] += live
+        else:
+            self.unknown.add(name)  # stats are read by compactor
+
+    def load(self, name):
+        """
+        Loads context items (replays journal or reads legacy JSON file)
+
+        :param name: context name (id)
+        :return: context items data
+        """
+        with self.lock:
+            if os.path.exists(self.get_journal_path(name)):
+                return list(self.replay(name).values())
+        return super(JsonlStorage, self).load(name)
+
+    def get_version(self, name):
+        """
+        Returns stored context version (journal or legacy JSON file mtime and size)
+
+        :param name: context name (id)
+        :return: version
+        """
+        with self.lock:
+            path = self.get_journal_path(name)
+            if os.path.exists(path):
+                return self.get_file_version(path)
+            return super(JsonlStorage, self).get_version(name)
+
+    def read_lines_reverse(self, path, end=None):
+        """
+        Reads file lines from the end in chunks
+
+        :param path: file path
+        :param end: offset to start reading from (None = end of file)
+        :return: generator of (line offset, line bytes)
+        """
+        with open(path, 'rb') as f:
+            if end is None:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+            pos = end
+            rest = b""
+            while pos > 0:
+                size = min(self.CHUNK_SIZE, pos)
+                pos -= size
+                f.seek(pos)
+                data = f.read(size) + rest
+                lines = data.split(b"\n")
+                rest = lines[0]
+                offset = pos + len(data) + 1
+                for line in reversed(lines[1:]):
+                    offset -= len(line) + 1
+                    yield offset, line
+            yield 0, rest
+
+    def load_tail(self, name, limit, before=None):
+        """
+        Loads last context items by scanning journal from the end (only needed part is parsed)
+
+        The newest record of every item decides if item is alive and its put record gives item position
+        (put records are appended in ids order). Loading older items (with before = first loaded id)
+        continues the previous scan.
+
+        :param name: context name (id)
+        :param limit: max number of items
+        :param before: load only items with id lower than this id (None = newest)
+        :return: context items data
+        """
+        with self.lock:
+            path = self.get_journal_path(name)
+            if not os.path.exists(path) or detect(path) is not None:
+                return super(JsonlStorage, self).load_tail(name, limit, before)  # compressed: full replay
+            self.config.writer.flush(path)
+
+            end = None
+            state = {}  # id -> newest item data (waiting for put record), None if deleted or already loaded
+            floor = 0  # items with lower ids are removed by newer cut record
+            cursor = self.cursors.get(name)
+            if before is not None and cursor is not None and cursor['before'] == before:
+                end = cursor['offset']
+                state = cursor['state']
+                floor = cursor['floor']
+
+            items = []
+            offset = end
+            for offset, line in self.read_lines_reverse(path, end):
+                if line.strip() == b"":
+                    continue
+                try:
+                    record = loads(line)
+                    if record['op'] == 'cut':
+                        floor = max(floor, record['before'])
+                        continue
+                    id = record['id'] if record['op'] == 'del' else record['item']['id']
+                except (ValueError, KeyError):
+                    continue  # partially written last line
+                if id < floor:
+                    if record['op'] == 'put':
+                        break  # put records are in ids order, all older items are removed
+                    continue
+                if record['op'] != 'put':
+                    if id not in state:
+                        state[id] = record['item'] if record['op'] == 'set' else None
+                    continue
+                data = state.get(id, record['item'])
+                state[id] = None
+                if data is not None and (before is None or id < before):
+                    items.append(data)
+                    if len(items) >= limit:
+                        break
+
+            items.reverse()
+            if len(items) > 0:
+                self.cursors[name] = {'before': items[0]['id'], 'offset': offset, 'state': state, 'floor': floor}
+            return items
+
+    def save(self, name, items):
+        """
+        Rewrites context journal
+
+        :param name: context name (id)
+        :param items: context items
+        """
+        data = {}
+        for item in items:
+            data[item.id] = item.serialize()
+        with self.lock:
+            self.write_journal(name, data)
+            legacy = self.get_path(name)
+            if os.path.exists(legacy):
+                os.remove(legacy)
+
+    def append(self, name, items, item):
+        """
+        Appends put record of new item
+
+        :param name: context name (id)
+        :param items: context items
+        :param item: appended item
+        """
+        with self.lock:
+            self.write_records(name, [{'op': 'put', 'item': item.serialize()}], 1)
+
+    def update(self, name, items, item):
+        """
+        Appends set record of updated item
+
+        :param name: context name (id)
+        :param items: context items
+        :param item: updated item
+        """
+        with self.lock:
+            self.write_records(name, [{'op': 'set', 'item': item.serialize()}], 0)
+
+    def remove(self, name, items, item):
+        """
+        Appends tombstone record of removed item
+
+        :param name: context name (id)
+        :param items: context items
+        :param item: removed item
+        """
+        with self.lock:
+            self.write_records(name, [{'op': 'del', 'id': item.id}], -1)
+
+    def remove_before(self, name, id):
+        """
+        Appends cut record removing all items older than given item
+
+        :param name: context name (id)
+        :param id: id of first kept item
+        """
+        with self.lock:
+            self.write_records(name, [{'op': 'cut', 'before': id}], 0)
+            if name in self.stats:
+                del self.stats[name]  # number of removed items is not known
+                self.unknown.add(name)
+
+    def compress(self, name, method, days):
+        """
+        Compresses context journal (or legacy JSON file) if not modified for given number of days
+
+        :param name: context name (id)
+        :param method: compression method
+        :param days: min number of days since last modification
+        :return: True if compressed
+        """
+        with self.lock:
+            path = self.get_journal_path(name)
+            if not os.path.exists(path):
+                return super(JsonlStorage, self).compress(name, method, days)
+            compressed = self.compress_file(path, method, days)
+            if compressed and name in self.cursors:
+                del self.cursors[name]
+            return compressed
+
+    def delete(self, name):
+        """
+        Deletes context journal and its index entry
+
+        :param name: context name (id)
+        """
+        with self.lock:
+            path = self.get_journal_path(name)
+            self.config.writer.discard(path)
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except Exception as e:
+                    print(e)
+            if name in self.stats:
+                del self.stats[name]
+            self.unknown.discard(name)
+            if name in self.cursors:
+                del self.cursors[name]
+        super(JsonlStorage, self).delete(name)
+
+    def delete_all(self):
+        """Deletes all context journals"""
+        with self.lock:
+            for name in self.contexts:
+                path = self.get_journal_path(name)
+                self.config.writer.discard(path)
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except Exception as e:
+                        print(e)
+            self.stats = {}
+            self.unknown = set()
+            self.cursors = {}
+        super(JsonlStorage, self).delete_all()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+import os
+import sqlite3
+import threading
+
+from core.codec import dumps, loads
+from core.storage.base import BaseStorage
+
+
+class SqliteStorage(BaseStorage):
+    FILENAME = "context.db"
+    PARTIAL = True
+
+    def __init__(self, config=None):
+        """
+        SQLite context storage: one row per context item
+
+        :param config: config object
+        """
+        super(SqliteStorage, self).__init__(config)
+        self.db = None
+        self.lock = threading.RLock()
+
+    def get_path(self):
+        """
+        Returns database file path
+
+        :return: file path
+        """
+        return os.path.join(self.config.path, self.FILENAME)
+
+    def install(self):
+        """
+        Opens database and creates schema
+
+        :return: True if database was created now
+        """
+        path = self.get_path()
+        created = not os.path.exists(path)
+        with self.lock:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            with self.db:
+                self.db.execute("""
+                    CREATE TABLE IF NOT EXISTS contexts (
+                        id TEXT PRIMARY KEY,
+                        name TEXT,
+                        date TEXT,
+                        meta TEXT NOT NULL,
+                        version INTEGER NOT NULL DEFAULT 0
+                    )""")
+                columns = [row[1] for row in self.db.execute("PRAGMA table_info(contexts)")]
+                if 'version' not in columns:  # database created by older version
+                    self.db.execute("ALTER TABLE contexts ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                self.db.execute("""
+                    CREATE TABLE IF NOT EXISTS items (
+                        ctx TEXT NOT NULL,
+                        item_id INTEGER NOT NULL,
+                        input_timestamp INTEGER,
+                        data TEXT NOT NULL,
+                        PRIMARY KEY (ctx, item_id)
+                    )""")
+                self.db.execute("CREATE INDEX IF NOT EXISTS items_ctx_ts ON items (ctx, input_timestamp)")
+        return created
+
+    def close(self):
+        """Closes database"""
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def load_list(self):
+        """
+        Loads contexts index
+
+        :return: contexts dict
+        """
+        contexts = {}
+        with self.lock:
+            for id, meta in self.db.execute("SELECT id, meta FROM contexts ORDER BY id"):
+                contexts[id] = loads(meta)
+        return contexts
+
+    def save_meta(self, name, meta):
+        """
+        Saves single context entry in index
+
+        :param name: context name (id)
+        :param meta: context meta dict
+        """
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO contexts (id, name, date, meta) VALUES (?, ?, ?, ?) "
+                            "ON CONFLICT (id) DO UPDATE SET name = excluded.name, date = excluded.date, "
+                            "meta = excluded.meta", (name, meta.get('name'), meta.get('date'), dumps(meta)))
+
+    def load(self, name):
+        """
+        Loads context items
+
+        :param name: context name (id)
+        :return: context items data
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT data FROM items WHERE ctx = ? ORDER BY item_id", (name,)).fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def get_version(self, name):
+        """
+        Returns stored context version (counter increased on every items change)
+
+        :param name: context name (id)
+        :return: version or None if context is not in index
+        """
+        with self.lock:
+            row = self.db.execute("SELECT version FROM contexts WHERE id = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def load_tail(self, name, limit, before=None):
+        """
+        Loads last context items (older than given item)
+
+        :param name: context name (id)
+        :param limit: max number of items
+        :param before: load only items with id lower than this id (None = newest)
+        :return: context items data
+        """
+        with self.lock:
+            if before is None:
+                rows = self.db.execute("SELECT data FROM items WHERE ctx = ? ORDER BY item_id DESC LIMIT ?",
+                                       (name, limit)).fetchall()
+            else:
+                rows = self.db.execute("SELECT data FROM items WHERE ctx = ? AND item_id < ? "
+                                       "ORDER BY item_id DESC LIMIT ?", (name, before, limit)).fetchall()
+        return [loads(row[0]) for row in reversed(rows)]
+
+    def touch(self, name):
+        """
+        Increases context version (without commit)
+
+        :param name: context name (id)
+        """
+        self.db.execute("UPDATE contexts SET version = version + 1 WHERE id = ?", (name,))
+
+    def insert(self, name, item):
+        """
+        Inserts or replaces item row (without commit)
+
+        :param name: context name (id)
+        :param item: context item
+        """
+        self.db.execute("INSERT OR REPLACE INTO items (ctx, item_id, input_timestamp, data) VALUES (?, ?, ?, ?)",
+                        (name, item.id, item.input_timestamp, dumps(item.serialize())))
+
+    def save(self, name, items):
+        """
+        Saves all context items (in one transaction)
+
+        :param name: context name (id)
+        :param items: context items
+        """
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM items WHERE ctx = ?", (name,))
+            for item in items:
+                self.insert(name, item)
+            self.touch(name)
+
+    def append(self, name, items, item):
+        """
+        Inserts appended item
+
+        :param name: context name (id)
+        :param items: context items
+        :param item: appended item
+        """
+        with self.lock, self.db:
+            self.insert(name, item)
+            self.touch(name)
+
+    def update(self, name, items, item):
+        """
+        Updates item row
+
+        :param name: context name (id)
+        :param items: context items
+        :param item: updated item
+        """
+        with self.lock, self.db:
+            self.insert(name, item)
+            self.touch(name)
+
+    def remove(self, name, items, item):
+        """
+        Deletes item row
+
+        :param name: context name (id)
+        :param items: context items
+        :param item: removed item
+        """
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM items WHERE ctx = ? AND item_id = ?", (name, item.id))
+            self.touch(name)
+
+    def remove_before(self, name, id):
+        """
+        Deletes rows of items older than given item
+
+        :param name: context name (id)
+        :param id: id of first kept item
+        """
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM items WHERE ctx = ? AND item_id < ?", (name, id))
+            self.touch(name)
+
+    def delete(self, name):
+        """
+        Deletes context with items (in one transaction)
+
+        :param name: context name (id)
+        """
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM items WHERE ctx = ?", (name,))
+            self.db.execute("DELETE FROM contexts WHERE id = ?", (name,))
+
+    def delete_all(self):
+        """Deletes all contexts"""
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM items")
+            self.db.execute("DELETE FROM contexts")
@@ -9,8 +9,241 @@
 # Created Date: 2023.04.09 20:00:00                  #
 # ================================================== #
 
+import math
+import threading
+
 import tiktoken
 
+from core import bpe
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# tags required tokens per model family, first matching prefix wins
+# message follows <|start|>{role/name}\n{content}<|end|>\n
+TOKENS_TABLE = [
+    ("gpt-4", {
+        'per_message': 3,
+        'per_name': 1,
+        'multiply': 2,
+        'extra': 6,
+    }),
+    ("text-davinci", {
+        'per_message': 1,
+        'per_name': 0,
+        'multiply': 1,
+        'extra': 5,
+    }),
+]
+TOKENS_DEFAULT = {
+    'per_message': 4,
+    'per_name': -1,
+    'multiply': 2,  # input + output
+    'extra': 5,
+}
+
+# estimator params per encoding: chars per token and relative error bound
+ESTIMATE_DEFAULT = {
+    'ratio': 4.0,
+    'error': 0.35,
+}
+ESTIMATE_TABLE = {
+    'cl100k_base': {
+        'ratio': 3.8,
+        'error': 0.3,
+    },
+    'p50k_base': {
+        'ratio': 3.6,
+        'error': 0.3,
+    },
+    'r50k_base': {
+        'ratio': 3.6,
+        'error': 0.3,
+    },
+}
+ESTIMATE_MIN_TOKENS = 20  # shorter samples are skipped in calibration
+ESTIMATE_ERROR_MIN = 4  # absolute error bound added to every estimate
+BATCH_THREADS = 8  # threads used by batch encoding
+
+# process-wide registry: model name -> encoding
+encodings = {}
+encodings_lock = threading.Lock()
+bpe_path = None  # directory with local BPE ranks files
+
+# calibrated estimator params: encoding name -> params
+estimates = {}
+
+
+def set_bpe_path(path):
+    """
+    Sets directory with local (offline) BPE ranks files
+
+    :param path: directory path
+    """
+    global bpe_path
+    bpe_path = path
+
+
+def get_encoding_name(model="gpt-3.5-turbo"):
+    """
+    Returns encoding name for model
+
+    :param model: model name
+    :return: encoding name
+    """
+    if model is None:
+        return DEFAULT_ENCODING
+    if model in tiktoken.model.MODEL_TO_ENCODING:
+        return tiktoken.model.MODEL_TO_ENCODING[model]
+    prefixes = getattr(tiktoken.model, 'MODEL_PREFIX_TO_ENCODING', {})
+    for prefix in prefixes:
+        if model.startswith(prefix):
+            return prefixes[prefix]
+    return DEFAULT_ENCODING
+
+
+def get_encoding(model="gpt-3.5-turbo"):
+    """
+    Returns encoding for model (resolved once and cached), local BPE files are used first
+
+    :param model: model name
+    :return: tiktoken encoding
+    """
+    try:
+        return encodings[model]
+    except KeyError:
+        pass
+
+    with encodings_lock:
+        if model not in encodings:
+            name = get_encoding_name(model)
+            encoding = None
+            for key in encodings:
+                if encodings[key].name == name:
+                    encoding = encodings[key]  # already loaded for another model
+                    break
+            if encoding is None:
+                encoding = bpe.get_encoding(name, bpe_path)
+            if encoding is None:
+                encoding = tiktoken.get_encoding(name)
+            encodings[model] = encoding
+    return encodings[model]
+
+
+def get_tokens_values(model="gpt-3.5-turbo"):
+    """
+    Returns tags required tokens for model
+
+    :param model: model name
+    :return: dict with per_message, per_name, multiply and extra tokens
+    """
+    if model is not None:
+        for prefix, values in TOKENS_TABLE:
+            if model.startswith(prefix):
+                return values
+    return TOKENS_DEFAULT
+
+
+def get_estimate_values(model="gpt-3.5-turbo"):
+    """
+    Returns estimator params for model encoding (calibrated if available)
+
+    :param model: model name
+    :return: dict with ratio (chars per token) and error (relative error bound)
+    """
+    name = get_encoding(model).name
+    if name in estimates:
+        return estimates[name]
+    if name in ESTIMATE_TABLE:
+        return ESTIMATE_TABLE[name]
+    return ESTIMATE_DEFAULT
+
+
+def set_estimate_values(values):
+    """
+    Sets calibrated estimator params
+
+    :param values: dict: encoding name -> dict with ratio and error
+    """
+    for name in values:
+        if 'ratio' in values[name] and 'error' in values[name] and values[name]['ratio'] > 0:
+            estimates[name] = values[name]
+
+
+def is_estimate_calibrated(model="gpt-3.5-turbo"):
+    """
+    Checks if estimator is calibrated for model encoding
+
+    :param model: model name
+    :return: True if calibrated
+    """
+    return get_encoding(model).name in estimates
+
+
+def num_tokens_estimate(string, model="gpt-3.5-turbo"):
+    """
+    Returns estimated number of tokens from string (without encoding)
+
+    :param string: string
+    :param model: model name
+    :return: estimated number of tokens
+    """
+    if string is None or string == "":
+        return 0
+    return int(math.ceil(len(string) / get_estimate_values(model)['ratio']))
+
+
+def num_tokens_estimate_error(num_tokens, model="gpt-3.5-turbo"):
+    """
+    Returns error bound for estimated number of tokens
+
+    :param num_tokens: estimated number of tokens
+    :param model: model name
+    :return: max expected difference from exact number of tokens
+    """
+    return int(math.ceil(num_tokens * get_estimate_values(model)['error'])) + ESTIMATE_ERROR_MIN
+
+
+def calibrate_estimate(texts, model="gpt-3.5-turbo"):
+    """
+    Calibrates estimator against texts, result is stored in registry
+
+    :param texts: sample texts (e.g. inputs and outputs from stored contexts)
+    :param model: model name
+    :return: dict with ratio and error, or None if not enough samples
+    """
+    encoding = get_encoding(model)
+    chars = 0
+    tokens = 0
+    samples = []
+    for text in texts:
+        if text is None or text == "":
+            continue
+        try:
+            num = len(encoding.encode(text))
+        except Exception as e:
+            print(e)
+            continue
+        if num < ESTIMATE_MIN_TOKENS:
+            continue
+        chars += len(text)
+        tokens += num
+        samples.append((len(text), num))
+
+    if tokens == 0:
+        return None
+
+    # error bound covers 95% of samples
+    ratio = chars / tokens
+    errors = sorted(abs(length / ratio - num) / num for length, num in samples)
+    error = errors[min(len(errors) - 1, int(len(errors) * 0.95))]
+
+    values = {
+        'ratio': round(ratio, 4),
+        'error': round(error, 4),
+    }
+    estimates[encoding.name] = values
+    return values
+
 
 def num_tokens_from_string(string, model="gpt-3.5-turbo"):
     """
@@ -20,13 +253,7 @@ def num_tokens_from_string(string, model="gpt-3.5-turbo"):
     :param model: model name
     :return: number of tokens
     """
-    try:
-        if model is not None:
-            encoding = tiktoken.encoding_for_model(model)
-        else:
-            encoding = tiktoken.get_encoding("cl100k_base")
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
+    encoding = get_encoding(model)
     try:
         return len(encoding.encode(string))
     except Exception as e:
@@ -34,6 +261,28 @@ def num_tokens_from_string(string, model="gpt-3.5-turbo"):
         return 0
 
 
+def num_tokens_batch(strings, model="gpt-3.5-turbo", num_threads=BATCH_THREADS):
+    """
+    Returns number of tokens for many strings (encoded in parallel)
+
+    :param strings: list of strings
+    :param model: model name
+    :param num_threads: number of encoding threads
+    :return: list with number of tokens (in order)
+    """
+    encoding = get_encoding(model)
+    texts = []
+    for string in strings:
+        if string is None:
+            string = ""
+        texts.append(string)
+    try:
+        return [len(tokens) for tokens in encoding.encode_batch(texts, num_threads=num_threads)]
+    except Exception:
+        # e.g. special token in one of texts, count one by one
+        return [num_tokens_from_string(text, model) for text in texts]
+
+
 def num_tokens_extra(model="gpt-3.5-turbo"):
     """
     Returns number of extra tokens
@@ -41,53 +290,34 @@ def num_tokens_extra(model="gpt-3.5-turbo"):
     :param model: model name
     :return: number of tokens
     """
-    tokens = 5
-    if model is not None and model.startswith("gpt-4"):
-        tokens = 6
-    elif model is not None and model.startswith("text-davinci"):
-        tokens = 5
-    return tokens
+    return get_tokens_values(model)['extra']
 
 
-def num_tokens_prompt(text, input_name, model="gpt-3.5-turbo"):
+def num_tokens_prompt(text, input_name, model="gpt-3.5-turbo", estimate=False):
     """
     Returns number of tokens from prompt
 
     :param text: prompt text
     :param input_name: input name
     :param model: model name
+    :param estimate: estimate text tokens instead of encoding
     :return: number of tokens
     """
-    try:
-        if model is not None:
-            encoding = tiktoken.encoding_for_model(model)
-        else:
-            encoding = tiktoken.get_encoding("cl100k_base")
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-
+    values = get_tokens_values(model)
     num_tokens = 0
 
-    # tags required tokens
-    tokens_per_message = 4  # message follows <|start|>{role/name}\n{content}<|end|>\n
-    tokens_per_name = -1
-
-    if model is not None and model.startswith("gpt-4"):
-        tokens_per_message = 3
-        tokens_per_name = 1
-    elif model is not None and model.startswith("text-davinci"):
-        tokens_per_message = 1
-        tokens_per_name = 0
-
     try:
-        num_tokens += num_tokens_from_string(text, model)
+        if estimate:
+            num_tokens += num_tokens_estimate(text, model)
+        else:
+            num_tokens += num_tokens_from_string(text, model)
     except Exception as e:
         print(e)
 
     if input_name is not None and input_name != "":
-        num_tokens += tokens_per_message + tokens_per_name
+        num_tokens += values['per_message'] + values['per_name']
     else:
-        num_tokens += tokens_per_message
+        num_tokens += values['per_message']
 
     return num_tokens
 
@@ -100,29 +330,68 @@ def num_tokens_from_context_item(item, model="gpt-3.5-turbo"):
     :param model: model name
     :return: number of tokens
     """
-    try:
-        if model is not None:
-            encoding = tiktoken.encoding_for_model(model)
-        else:
-            encoding = tiktoken.get_encoding("cl100k_base")
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-
-    # tags required tokens
-    tokens_per_message = 4  # message follows <|start|>{role/name}\n{content}<|end|>\n
-    tokens_per_name = -1
-    multiply = 2
-    if model is not None and model.startswith("gpt-4"):
-        tokens_per_message = 3
-        tokens_per_name = 1
-    elif model is not None and model.startswith("text-davinci"):
-        tokens_per_message = 1
-        tokens_per_name = 0
-        multiply = 1
+    values = get_tokens_values(model)
 
     num_tokens = 0
-    num_tokens += tokens_per_message * multiply  # input + output
+    num_tokens += values['per_message'] * values['multiply']  # input + output
+
+    if item.input_name != "" and item.input_name is not None:
+        num_tokens += values['per_name']
+    if item.output_name != "" and item.output_name is not None:
+        num_tokens += values['per_name']
+
+    num_tokens += num_tokens_context_item_content(item, get_encoding(model))
+    return num_tokens
+
+
+def num_tokens_from_context_items(items, model="gpt-3.5-turbo", num_threads=BATCH_THREADS):
+    """
+    Returns number of tokens for many context items, not cached items are encoded in one batch
 
+    :param items: context items list
+    :param model: model name
+    :param num_threads: number of encoding threads
+    :return: list with number of tokens (in order)
+    """
+    encoding = get_encoding(model)
+
+    # collect texts of items without cached tokens
+    texts = []
+    missing = []
+    for item in items:
+        if encoding.name in item.tokens_cache:
+            continue
+        names = []
+        if item.input_name != "" and item.input_name is not None:
+            names.append(item.input_name)
+        if item.output_name != "" and item.output_name is not None:
+            names.append(item.output_name)
+        missing.append((item, len(names) + 2))
+        texts += [item.input, item.output] + names
+
+    if len(missing) > 0:
+        roles = len(encoding.encode('user')) + len(encoding.encode('assistant'))
+        counts = num_tokens_batch(texts, model, num_threads)
+        i = 0
+        for item, num in missing:
+            item.tokens_cache[encoding.name] = roles + sum(counts[i:i + num])
+            i += num
+
+    return [num_tokens_from_context_item(item, model) for item in items]
+
+
+def num_tokens_context_item_content(item, encoding):
+    """
+    Returns number of tokens from context item content (memoized on item per encoding)
+
+    :param item: context item
+    :param encoding: tiktoken encoding
+    :return: number of tokens
+    """
+    if encoding.name in item.tokens_cache:
+        return item.tokens_cache[encoding.name]
+
+    num_tokens = 0
     try:
         num_tokens += len(encoding.encode(item.input))
     except Exception as e:
@@ -144,16 +413,15 @@ def num_tokens_from_context_item(item, model="gpt-3.5-turbo"):
         print(e)
 
     if item.input_name != "" and item.input_name is not None:
-        num_tokens += tokens_per_name
         try:
             num_tokens += len(encoding.encode(item.input_name))
         except Exception as e:
             print(e)
     if item.output_name != "" and item.output_name is not None:
-        num_tokens += tokens_per_name
         try:
             num_tokens += len(encoding.encode(item.output_name))
         except Exception as e:
             print(e)
 
+    item.tokens_cache[encoding.name] = num_tokens
     return num_tokens
@@ -66,11 +66,18 @@ class Input:
         self.window.data['input.send_btn'].clicked.connect(
             lambda: self.window.controller.input.send())
 
+        # cancel button
+        self.window.data['input.cancel_btn'] = QPushButton(trans("input.btn.cancel"))
+        self.window.data['input.cancel_btn'].clicked.connect(
+            lambda: self.window.controller.input.cancel())
+        self.window.data['input.cancel_btn'].setEnabled(False)
+
         # send layout
         send_layout = QHBoxLayout()
         send_layout.addWidget(self.window.data['input.send_clear'])
         send_layout.addWidget(self.window.data['input.send_enter'])
         send_layout.addWidget(self.window.data['input.send_shift_enter'])
+        send_layout.addWidget(self.window.data['input.cancel_btn'])
         send_layout.addWidget(self.window.data['input.send_btn'])
         send_layout.setAlignment(Qt.AlignRight)
 
@@ -59,6 +59,7 @@ class ChatInput(QTextEdit):
         :param event: key event
         """
         super(ChatInput, self).keyPressEvent(event)
+        self.window.controller.input.prewarm()
         self.window.controller.ui.update()
         if event.key() == QtCore.Qt.Key_Return or event.key() == QtCore.Qt.Key_Enter:
             if self.window.config.data['send_shift_enter']:
@@ -68,6 +69,8 @@ class ChatInput(QTextEdit):
             else:
                 self.window.controller.input.send()
             self.setFocus()
+        elif event.key() == QtCore.Qt.Key_Escape:
+            self.window.controller.input.cancel()
 
 
 class ChatOutput(QTextEdit):
@@ -81,6 +84,17 @@ class ChatOutput(QTextEdit):
         self.window = window
         self.setReadOnly(True)
         self.setStyleSheet("color: {};".format(self.window.config.data['ui.chatbox.font.color']))
+        self.verticalScrollBar().valueChanged.connect(self.window.controller.output.handle_scroll)
+
+    def wheelEvent(self, event):
+        """
+        Wheel event: loads older context items if scrolled up at the top
+
+        :param event: wheel event
+        """
+        super(ChatOutput, self).wheelEvent(event)
+        if event.angleDelta().y() > 0:
+            self.window.controller.output.handle_scroll(self.verticalScrollBar().value())
 
 
 class SelectMenu(QTreeView):
@@ -213,6 +227,27 @@ class ContextSelectMenu(SelectMenu):
         self.id = id
 
         self.doubleClicked.connect(self.dblclick)
+        self.setMouseTracking(True)
+        self.entered.connect(self.hover)
+
+    def hover(self, val):
+        """
+        Hover event (prefetches hovered context)
+
+        :param val: hovered item index
+        """
+        self.window.controller.context.prefetch(val.row())
+
+    def currentChanged(self, current, previous):
+        """
+        Current item change event (prefetches contexts around current item on keyboard navigation)
+
+        :param current: current item index
+        :param previous: previous item index
+        """
+        super(ContextSelectMenu, self).currentChanged(current, previous)
+        if current.isValid():
+            self.window.controller.context.prefetch(current.row())
 
     def click(self, val):
         """
@@ -9,10 +9,11 @@
 # Created Date: 2023.04.09 20:00:00                  #
 # ================================================== #
 
-from urllib.request import urlopen, Request
+import warnings
 from packaging.version import parse as parse_version
-import json
-import ssl
+from urllib3.exceptions import InsecureRequestWarning
+from core.codec import loads
+from core.session import get_session
 from core.utils import trans
 
 
@@ -30,16 +31,11 @@ class Updater:
         print("Checking for updates...")
         url = self.window.website + "/api/version?v=" + str(self.window.version)
         try:
-            ctx = ssl.create_default_context()
-            ctx.check_hostname = False
-            ctx.verify_mode = ssl.CERT_NONE
-
-            req = Request(
-                url=url,
-                headers={'User-Agent': 'Mozilla/5.0'}
-            )
-            response = urlopen(req, context=ctx, timeout=3)
-            data_json = json.loads(response.read())
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', InsecureRequestWarning)  # certificate is not verified
+                response = get_session(self.window.config).get(url, headers={'User-Agent': 'Mozilla/5.0'},
+                                                               timeout=3, verify=False)
+            data_json = loads(response.content)
             newest_version = data_json["version"]
             newest_build = data_json["build"]
 
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+import os
+import shutil
+import threading
+import time
+
+from core.codec import load
+from core.compress import detect
+
+FSYNC_NONE = 'none'  # no fsync, fastest
+FSYNC_RELAXED = 'relaxed'  # fsync file data before rename
+FSYNC_STRICT = 'strict'  # fsync file data before rename, directory after rename and appends
+
+# write policy, shared by all writes
+policy = {
+    'fsync': FSYNC_RELAXED,
+    'journal': False,  # keep previous version of file (.bak) to recover from broken writes
+}
+
+
+class Writer:
+    DELAY = 0.5  # seconds, writes of the same file within this window are coalesced
+
+    def __init__(self):
+        """
+        Write-behind file writer
+
+        Writes are queued per file and performed on background thread, repeated writes
+        of the same file are coalesced (only the last content is written), appends are joined
+        """
+        self.cond = threading.Condition()
+        self.pending = {}  # path -> job
+        self.busy = set()  # paths being written now
+        self.flushing = 0
+        self.thread = None
+
+    def start(self):
+        """Starts writer thread (if not started yet)"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def write(self, path, data):
+        """
+        Queues file write (replaces whole file)
+
+        :param path: file path
+        :param data: content string/bytes or callable returning content (called on writer thread)
+        """
+        with self.cond:
+            self.pending[path] = {
+                'mode': 'write',
+                'data': [data],
+                'time': self.get_job_time(path),
+            }
+            self.start()
+            self.cond.notify_all()
+
+    def append(self, path, data):
+        """
+        Queues file append
+
+        :param path: file path
+        :param data: string or bytes to append (the same type for all appends of file)
+        """
+        with self.cond:
+            if path in self.pending:
+                self.pending[path]['data'].append(data)
+            else:
+                self.pending[path] = {
+                    'mode': 'append',
+                    'data': [data],
+                    'time': time.time(),
+                }
+            self.start()
+            self.cond.notify_all()
+
+    def discard(self, path):
+        """
+        Discards pending writes of file (e.g. before file is deleted)
+
+        :param path: file path
+        """
+        with self.cond:
+            if path in self.pending:
+                del self.pending[path]
+            while path in self.busy:
+                self.cond.wait()
+
+    def flush(self, path=None):
+        """
+        Writes pending data immediately and waits until written
+
+        :param path: file path or None for all files
+        """
+        with self.cond:
+            if not self.is_pending(path):
+                return
+            self.flushing += 1
+            self.cond.notify_all()
+            while self.is_pending(path):
+                self.cond.wait()
+            self.flushing -= 1
+
+    def is_pending(self, path=None):
+        """
+        Checks if there are pending writes
+
+        :param path: file path or None for any file
+        :return: True if pending
+        """
+        if path is None:
+            return len(self.pending) > 0 or len(self.busy) > 0
+        return path in self.pending or path in self.busy
+
+    def get_job_time(self, path):
+        """
+        Returns queue time for job (keeps time of already queued job, so writes are not postponed forever)
+
+        :param path: file path
+        :return: timestamp
+        """
+        if path in self.pending:
+            return self.pending[path]['time']
+        return time.time()
+
+    def run(self):
+        """Writer thread loop"""
+        while True:
+            with self.cond:
+                while len(self.pending) == 0:
+                    self.cond.wait()
+
+                # wait for coalescing window unless flush requested
+                while self.flushing == 0 and len(self.pending) > 0:
+                    oldest = min(job['time'] for job in self.pending.values())
+                    remaining = oldest + self.DELAY - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+
+                jobs = self.pending
+                self.pending = {}
+                self.busy = set(jobs.keys())
+
+            for path in jobs:
+                self.execute(path, jobs[path])
+
+            with self.cond:
+                self.busy = set()
+                self.cond.notify_all()
+
+    def execute(self, path, job):
+        """
+        Performs write
+
+        :param path: file path
+        :param job: job dict
+        """
+        try:
+            data = []
+            for chunk in job['data']:
+                if callable(chunk):
+                    chunk = chunk()
+                data.append(chunk)
+            joined = b"".join(data) if isinstance(data[0], bytes) else "".join(data)
+            if job['mode'] == 'write':
+                write_file(path, joined)
+            else:
+                append_file(path, joined)
+        except Exception as e:
+            print("Error writing file {}: {}".format(path, e))
+
+
+def set_policy(fsync=FSYNC_RELAXED, journal=False):
+    """
+    Sets write policy
+
+    :param fsync: fsync policy: none, relaxed or strict
+    :param journal: keep previous version of replaced files
+    """
+    if fsync in [FSYNC_NONE, FSYNC_RELAXED, FSYNC_STRICT]:
+        policy['fsync'] = fsync
+    policy['journal'] = bool(journal)
+
+
+def sync_dir(path):
+    """
+    Syncs directory entry (rename) to disk
+
+    :param path: directory path
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return  # not supported on Windows
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_file(path, data):
+    """
+    Writes file atomically: temporary file, fsync (by policy), optional backup (journal) and rename
+
+    :param path: file path
+    :param data: content string or bytes
+    """
+    tmp_path = path + '.tmp'
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        if policy['fsync'] != FSYNC_NONE:
+            f.flush()
+            os.fsync(f.fileno())
+
+    if policy['journal'] and os.path.exists(path):
+        bak_path = path + '.bak'
+        if os.path.exists(bak_path):
+            os.remove(bak_path)
+        try:
+            os.link(path, bak_path)
+        except OSError:
+            shutil.copyfile(path, bak_path)
+
+    os.replace(tmp_path, path)
+    if policy['fsync'] == FSYNC_STRICT:
+        sync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def append_file(path, data):
+    """
+    Appends to file (fsync by policy)
+
+    :param path: file path
+    :param data: string or bytes to append
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with open(path, 'ab') as f:
+        f.write(data)
+        if policy['fsync'] == FSYNC_STRICT:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def is_valid(path, parse=False):
+    """
+    Checks if file is complete: not empty and (for plain JSON files) ends with closing bracket
+
+    :param path: file path
+    :param parse: fully parse JSON file instead of checking its end only
+    :return: True if valid
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    name = path[:-4] if path.endswith('.tmp') or path.endswith('.bak') else path
+    if not name.endswith('.json'):
+        return True
+    try:
+        if parse:
+            load(path)
+            return True
+        if detect(path) is not None:
+            return True  # compressed files are only written by rename, never in place
+        with open(path, 'rb') as f:
+            f.seek(max(0, os.path.getsize(path) - 64))
+            return f.read().rstrip()[-1:] in [b'}', b']']
+    except Exception:
+        return False
+
+
+def recover(path):
+    """
+    Repairs files in directory after interrupted writes
+
+    Leftover temporary files replace missing or broken targets (or are removed),
+    broken JSON files are restored from backup (if journal was enabled)
+
+    :param path: directory path
+    :return: list of repaired files
+    """
+    repaired = []
+    if not os.path.isdir(path):
+        return repaired
+
+    for file in os.listdir(path):
+        file_path = os.path.join(path, file)
+        try:
+            if file.endswith('.tmp'):
+                target = file_path[:-4]
+                if not is_valid(target) and is_valid(file_path, True):
+                    os.replace(file_path, target)
+                    repaired.append(target)
+                else:
+                    os.remove(file_path)
+            elif file.endswith('.ztmp'):
+                os.remove(file_path)  # interrupted compression, original file is untouched
+            elif file.endswith('.json') and os.path.exists(file_path) and not is_valid(file_path):
+                bak_path = file_path + '.bak'
+                if is_valid(bak_path, True):
+                    shutil.copyfile(bak_path, file_path)
+                    repaired.append(file_path)
+                else:
+                    print("Broken file (no valid backup): {}".format(file_path))
+        except Exception as e:
+            print("Error recovering file {}: {}".format(file_path, e))
+
+    for file_path in repaired:
+        print("Recovered file: {}".format(file_path))
+    return repaired
@@ -15,6 +15,7 @@ a = Analysis(
         ('data/config/config.json', 'data/config'),
         ('data/config/models.json', 'data/config'),
         ('data/locale/*', 'data/locale'),
+        ('data/tiktoken/*', 'data/tiktoken'),
         ('data/logo.png', 'data'),
         ('CHANGELOG.txt', '.'),
         ('README.md', '.'),
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+# Benchmark of JSON codecs: save and load times of one conversation (JSON file and JSONL journal)
+# Usage (from app directory): python tools/bench_codec.py [items] [repeats]
+
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from core.codec import get_codecs, set_codec, dumpb, load, loads
+from core.context import ContextItem
+from core.writer import write_file, set_policy, FSYNC_NONE
+
+
+def create_items(num):
+    """
+    Creates conversation items data
+
+    :param num: number of items
+    :return: items data list
+    """
+    items = []
+    for i in range(num):
+        item = ContextItem('chat')
+        item.id = i + 1
+        item.set_input("Question {}: how does this work? ".format(i) * 4, 'User')
+        item.set_output("Answer {}: it works like this, zażółć gęślą jaźń. ".format(i) * 12, 'AI')
+        item.set_tokens(40, 160)
+        item.tokens_cache = {'cl100k_base': 200}
+        items.append(item.serialize())
+    return items
+
+
+def measure(func, repeats):
+    """
+    Returns best time of function calls
+
+    :param func: function
+    :param repeats: number of calls
+    :return: time in ms
+    """
+    best = None
+    for i in range(repeats):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best * 1000
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    items = create_items(num)
+    path = tempfile.mkdtemp()
+    json_path = os.path.join(path, 'context.json')
+    jsonl_path = os.path.join(path, 'context.jsonl')
+    set_policy(FSYNC_NONE)  # measure codecs, not disk
+
+    print("Conversation: {} items, best of {} runs".format(num, repeats))
+    print("{:<8} {:>10} {:>10} {:>10} {:>10} {:>8}".format('codec', 'json save', 'json load', 'jsonl save',
+                                                           'jsonl load', 'MB'))
+    try:
+        for codec in get_codecs():
+            set_codec(codec)
+            save_json = measure(lambda: write_file(json_path, dumpb(items)), repeats)
+            load_json = measure(lambda: load(json_path), repeats)
+            save_jsonl = measure(lambda: write_file(jsonl_path, b"".join(
+                [dumpb({'op': 'put', 'item': item}) + b"\n" for item in items])), repeats)
+            load_jsonl = measure(lambda: [loads(line) for line in open(jsonl_path, 'rb')], repeats)
+            size = os.path.getsize(json_path) / 1024 / 1024
+            print("{:<8} {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms {:>8.2f}".format(codec, save_json, load_json,
+                                                                                     save_jsonl, load_jsonl, size))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ================================================== #
+# This file is a part of PYGPT package               #
+# Website: https://pygpt.net                         #
+# GitHub:  https://github.com/szczyglis-dev/py-gpt   #
+# MIT License                                        #
+# Created By  : Marcin Szczygliński                  #
+# Created Date: 2023.04.09 20:00:00                  #
+# ================================================== #
+
+# Reload check of context storages: items added to context are stored with their tokens cache
+# Usage (from app directory): python tools/check_storage.py [items]
+
+import datetime
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from core.context import Context, ContextItem
+from core.writer import Writer
+
+STORAGES = ('json', 'jsonl', 'sqlite')
+
+
+class CheckConfig:
+    def __init__(self, path, storage):
+        """
+        Minimal config for context storage check
+
+        :param path: data directory
+        :param storage: storage name
+        """
+        self.path = path
+        self.writer = Writer()
+        self.data = {
+            'ctx_storage': storage,
+            'ctx_lazy': True,
+            'ctx_lazy_items': 20,
+            'ctx_cache_items': 0,
+            'ctx_cache_size': 0,
+            'ctx_compress': 'none',
+            'ctx_compress_days': 30,
+            'store_history': True,
+            'model': 'gpt-4',
+            'max_total_tokens': 4096,
+        }
+
+    def append_meta(self):
+        """
+        Returns app meta data
+
+        :return: meta dict
+        """
+        return {}
+
+
+def check(storage, num):
+    """
+    Adds items to new context and checks tokens cache of items read back from storage
+
+    :param storage: storage name
+    :param num: number of items
+    :return: True if all stored items have tokens cache
+    """
+    path = tempfile.mkdtemp()
+    try:
+        context = Context(CheckConfig(path, storage))
+        context.load_list()
+        name = context.create_id()
+        context.contexts[name] = {
+            'id': name,
+            'name': "check",
+            'date': datetime.datetime.now().strftime("%Y-%m-%d"),
+        }
+        context.dump_meta(name)
+        context.select(name)
+        for i in range(num):
+            item = ContextItem('chat')
+            item.set_input("Question {}".format(i))
+            item.set_output("Answer {}".format(i))
+            context.add(item)
+        context.storage.close()
+        context.config.writer.flush()
+
+        reloaded = Context(CheckConfig(path, storage))
+        reloaded.load_list()
+        reloaded.init_storage()
+        items = reloaded.storage.load(name)
+        return len(items) == num and all(len(data.get('tokens_cache', {})) > 0 for data in items)
+    finally:
+        shutil.rmtree(path)
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    failed = 0
+    for storage in STORAGES:
+        ok = check(storage, num)
+        if not ok:
+            failed += 1
+        print("{:<8} {}".format(storage, 'OK' if ok else 'FAILED (tokens cache not stored)'))
+    sys.exit(1 if failed > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()